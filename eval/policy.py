@@ -357,12 +357,8 @@ class LightPolicy:
         # Darum Skalar bei den Infrarot - Rotbereich 860nm bis 610nm zugunsten des Infrarotbereiches
         scalar_red = [0.4, 0.5, 1, 2, 3, 5]
         scalar_blue = [1, 1, 1, 1, 1, 1]
-        cur_redvalue = self._calculate_scaled_brightness(
-            list(packet.AS7263.values()), scalar_red
-        )
-        cur_bluevalue = self._calculate_scaled_brightness(
-            list(packet.AS7262.values()), scalar_blue
-        )
+        cur_redvalue = self._calculate_scaled_brightness(packet.AS7263, scalar_red)
+        cur_bluevalue = self._calculate_scaled_brightness(packet.AS7262, scalar_blue)
 
         redvalues: List[float] = []
         bluevalues: List[float] = []
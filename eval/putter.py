@@ -45,22 +45,8 @@ def download_single(
             tt_packets.append((timestamp, packet))
         elif packet_type == 73:
             wavelengths = [int(x) for x in parts[4:16]]
-            AS7263 = {
-                610: wavelengths[0],
-                680: wavelengths[1],
-                730: wavelengths[2],
-                760: wavelengths[3],
-                810: wavelengths[4],
-                860: wavelengths[5],
-            }
-            AS7262 = {
-                450: wavelengths[6],
-                500: wavelengths[7],
-                550: wavelengths[8],
-                570: wavelengths[9],
-                600: wavelengths[10],
-                650: wavelengths[11],
-            }
+            AS7263 = tuple(wavelengths[:6])
+            AS7262 = tuple(wavelengths[6:])
             packet = packets.LightSensorPacket(
                 receiver_address=cloud_address,
                 sender_address=treetalker_address,
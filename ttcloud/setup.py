@@ -8,12 +8,12 @@ setup(
     author_email="msommer@informatik.uni-marburg.de",
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
-        "Programming Language :: Python :: 3.7",
-        "Programming Language :: Python :: 3.8",
-        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
     ],
+    python_requires=">=3.10",
     packages=find_packages(exclude=["tests"]),
-    install_requires=["paho-mqtt", "influxdb", "scikit-learn"],
+    install_requires=["paho-mqtt", "influxdb", "numpy"],
     extras_require={"lora": ["RPi.GPIO", "spidev"]},
     scripts=[
         "ttt/radio_communication_interface.py",
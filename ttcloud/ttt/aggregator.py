@@ -8,10 +8,11 @@ from __future__ import annotations
 import argparse
 import logging
 import time
-import json
 
 from typing import Dict, List
-from statistics import mean, stdev
+from math import sqrt
+
+import numpy as np
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
@@ -19,9 +20,31 @@ import influxdb as influx
 from influxdb.resultset import ResultSet
 
 from ttt.policy import ANALYSIS_INTERVAL
-
+from ttt.util import json_dumps, tune_influx_session
 
 SLEEP_TIME = 600
+INITIAL_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 50000
+CHUNK_TIME_TARGET = 0.5
+
+
+class RunningStats:
+    """Welford accumulator, folds streamed datapoints into mean/stdev without keeping them."""
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean: float = 0.0
+        self._m2: float = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def stdev(self) -> float:
+        return sqrt(self._m2 / (self.count - 1))
 
 
 class Aggregator:
@@ -31,7 +54,17 @@ class Aggregator:
         self.mqtt_client = mqtt.Client(client_id="aggregator", protocol=mqtt.MQTTv5)
         self.mqtt_client.connect(host=broker_address, port=broker_port)
 
-        self.influx_client = influx.InfluxDBClient(host=influx_address, port=8086)
+        self.influx_client = influx.InfluxDBClient(
+            host=influx_address, port=8086, gzip=True
+        )
+        tune_influx_session(self.influx_client)
+
+        self.chunk_size = INITIAL_CHUNK_SIZE
+
+        # The analysis window is constant, so the query strings only need to
+        # be formatted once.
+        self.movement_query = f'SELECT "x_derivation", "y_derivation", "z_derivation" FROM "gravity" WHERE time > now() - {ANALYSIS_INTERVAL}'
+        self.temperature_query = f'SELECT "ttt_reference_probe_cold","ttt_reference_probe_hot","ttt_heat_probe_cold","ttt_heat_probe_hot" FROM "stem_temperature" WHERE time > now() - {ANALYSIS_INTERVAL}'
 
     def __enter__(self) -> Aggregator:
         self.mqtt_client.loop_start()
@@ -51,46 +84,56 @@ class Aggregator:
     def _aggregate_movement(self) -> Dict[str, float]:
         logging.info("Aggregating movement data")
 
-        x_derivs: List[int] = []
-        y_derivs: List[int] = []
-        z_derivs: List[int] = []
+        stats_x = RunningStats()
+        stats_y = RunningStats()
+        stats_z = RunningStats()
 
         try:
-            data: ResultSet = self.influx_client.query(
-                f'SELECT "x_derivation", "y_derivation", "z_derivation" FROM "gravity" WHERE time > now() - {ANALYSIS_INTERVAL}'
+            chunks = self.influx_client.query(
+                self.movement_query,
+                chunked=True,
+                chunk_size=self.chunk_size,
+                epoch="s",
             )
+
+            for chunk in chunks:
+                chunk_start = time.monotonic()
+                for datapoint in chunk.get_points("gravity"):
+                    stats_x.update(datapoint["x_derivation"])
+                    stats_y.update(datapoint["y_derivation"])
+                    stats_z.update(datapoint["z_derivation"])
+
+                # Grow the chunk size as long as chunks are processed quickly,
+                # so the first result stays fast but large windows don't pay
+                # per-chunk overhead forever.
+                if (
+                    time.monotonic() - chunk_start < CHUNK_TIME_TARGET
+                    and self.chunk_size < MAX_CHUNK_SIZE
+                ):
+                    self.chunk_size *= 2
         except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
+            logging.error("Influxdb error: %s", err)
             return {}
 
-        for datapoint in data.get_points("gravity"):
-            x_derivs.append(datapoint["x_derivation"])
-            y_derivs.append(datapoint["y_derivation"])
-            z_derivs.append(datapoint["z_derivation"])
-
-        if len(x_derivs) < 2 or len(y_derivs) < 2 or len(z_derivs) < 2:
+        if stats_x.count < 2 or stats_y.count < 2 or stats_z.count < 2:
             logging.debug(
-                f"Insufficient movement data: [x: {len(x_derivs)}, y: {len(y_derivs)}, z: {len(z_derivs)}]"
+                "Insufficient movement data: [x: %s, y: %s, z: %s]",
+                stats_x.count,
+                stats_y.count,
+                stats_z.count,
             )
             return {}
 
-        mean_x = mean(x_derivs)
-        stdev_x = stdev(x_derivs, mean_x)
-        mean_y = mean(y_derivs)
-        stdev_y = stdev(y_derivs, mean_y)
-        mean_z = mean(z_derivs)
-        stdev_z = stdev(z_derivs, mean_z)
-
         aggregated = {
-            "mean_x": mean_x,
-            "stdev_x": stdev_x,
-            "mean_y": mean_y,
-            "stdev_y": stdev_y,
-            "mean_z": mean_z,
-            "stdev_z": stdev_z,
+            "mean_x": stats_x.mean,
+            "stdev_x": stats_x.stdev,
+            "mean_y": stats_y.mean,
+            "stdev_y": stats_y.stdev,
+            "mean_z": stats_z.mean,
+            "stdev_z": stats_z.stdev,
         }
 
-        logging.debug(f"Aggreagated movement data: {aggregated}")
+        logging.debug("Aggreagated movement data: %s", aggregated)
 
         return aggregated
 
@@ -98,11 +141,13 @@ class Aggregator:
         logging.info("Aggregating temperature data")
 
         try:
+            # epoch="s" spares the server from formatting RFC3339 time
+            # strings nobody reads here and shrinks the response payload.
             data: ResultSet = self.influx_client.query(
-                f'SELECT "ttt_reference_probe_cold","ttt_reference_probe_hot","ttt_heat_probe_cold","ttt_heat_probe_hot" FROM "stem_temperature" WHERE time > now() - {ANALYSIS_INTERVAL}'
+                self.temperature_query, epoch="s"
             )
         except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
+            logging.error("Influxdb error: %s", err)
             return {}
 
         reference_probe_cold: List[float] = []
@@ -123,28 +168,32 @@ class Aggregator:
             or len(heat_probe_hot) < 2
         ):
             logging.debug(
-                f"Insufficient temperature data: [ref_cold: {len(reference_probe_cold)}, ref_hot: {len(reference_probe_hot)}, heat_cold: {len(heat_probe_cold)}, heat_hot: {len(heat_probe_hot)}]"
+                "Insufficient temperature data: [ref_cold: %s, ref_hot: %s, heat_cold: %s, heat_hot: %s]",
+                len(reference_probe_cold),
+                len(reference_probe_hot),
+                len(heat_probe_cold),
+                len(heat_probe_hot),
             )
             return {}
 
-        deltas_cold: List[float] = [
-            abs(heat - reference)
-            for heat, reference in zip(heat_probe_cold, reference_probe_cold)
-        ]
-        stdev_delta_cold = stdev(deltas_cold)
+        deltas_cold = np.abs(
+            np.asarray(heat_probe_cold, dtype=np.float64)
+            - np.asarray(reference_probe_cold, dtype=np.float64)
+        )
+        stdev_delta_cold = float(deltas_cold.std(ddof=1))
 
-        deltas_hot: List[float] = [
-            abs(heat - reference)
-            for heat, reference in zip(heat_probe_hot, reference_probe_hot)
-        ]
-        stdev_delta_hot = stdev(deltas_hot)
+        deltas_hot = np.abs(
+            np.asarray(heat_probe_hot, dtype=np.float64)
+            - np.asarray(reference_probe_hot, dtype=np.float64)
+        )
+        stdev_delta_hot = float(deltas_hot.std(ddof=1))
 
         aggregated_data = {
             "stdev_delta_cold": stdev_delta_cold,
             "stdev_delta_hot": stdev_delta_hot,
         }
 
-        logging.debug(f"Aggreagated temperature data: {aggregated_data}")
+        logging.debug("Aggreagated temperature data: %s", aggregated_data)
 
         return aggregated_data
 
@@ -154,18 +203,18 @@ class Aggregator:
         while True:
             aggregated_movement = self._aggregate_movement()
             if aggregated_movement:
-                logging.debug(f"Sending movement data: {aggregated_movement}")
+                logging.debug("Sending movement data: %s", aggregated_movement)
                 self.mqtt_client.publish(
-                    "global/movement", payload=json.dumps(aggregated_movement)
+                    "global/movement", payload=json_dumps(aggregated_movement)
                 )
             else:
                 logging.debug("No movement data to send")
 
             aggregated_temperature = self._aggregate_temperature()
             if aggregated_temperature:
-                logging.debug(f"Sending temperature data: {aggregated_temperature}")
+                logging.debug("Sending temperature data: %s", aggregated_temperature)
                 self.mqtt_client.publish(
-                    "global/temperature", payload=json.dumps(aggregated_temperature)
+                    "global/temperature", payload=json_dumps(aggregated_temperature)
                 )
             else:
                 logging.debug("No temperature data to send")
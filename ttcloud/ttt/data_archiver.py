@@ -8,8 +8,8 @@ from __future__ import annotations
 import argparse
 import logging
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
-from base64 import b64decode
 from time import sleep
 
 import paho.mqtt.client as mqtt
@@ -23,6 +23,7 @@ from ttt.packets import (
     LightSensorPacket,
     unmarshall,
 )
+from ttt.util import tune_influx_session
 
 
 class DataArchiver:
@@ -34,7 +35,15 @@ class DataArchiver:
         self.mqtt_client.on_message = self.on_message
         self.mqtt_client.subscribe("receive/#")
 
-        self.influx_client = influx.InfluxDBClient(host=influx_address, port=8086)
+        self.influx_client = influx.InfluxDBClient(
+            host=influx_address, port=8086, gzip=True
+        )
+        tune_influx_session(self.influx_client)
+
+        # Paho delivers messages on a single network thread; handing the
+        # parse + write off to a pool keeps that thread free to read the
+        # next MQTT frame while Influx POSTs are in flight.
+        self.pool = ThreadPoolExecutor(max_workers=4)
 
     def __enter__(self) -> DataArchiver:
         self.mqtt_client.loop_start()
@@ -49,30 +58,37 @@ class DataArchiver:
                 packetType=PacketTypes.DISCONNECT, aName="Normal disconnection"
             )
         )
+        self.pool.shutdown(wait=True)
         self.influx_client.close()
 
     def on_message(
         self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
     ) -> None:
-        logging.debug(f"Received MQTT Message on topic {message.topic}")
+        logging.debug("Received MQTT Message on topic %s", message.topic)
+        self.pool.submit(self._process, message.payload)
 
-        packet: TTPacket = unmarshall(b64decode(message.payload))
-        logging.debug(f"Unamarshalled packet: {packet}")
+    def _process(self, payload: bytes) -> None:
+        # Nobody inspects the submitted futures, so any exception raised
+        # here would vanish silently; log everything ourselves.
+        try:
+            packet: TTPacket = unmarshall(payload)
+            logging.debug("Unamarshalled packet: %s", packet)
 
-        if not (
-            isinstance(packet, DataPacketRev31)
-            or isinstance(packet, DataPacketRev32)
-            or isinstance(packet, LightSensorPacket)
-        ):
-            return
+            if not (
+                isinstance(packet, DataPacketRev31)
+                or isinstance(packet, DataPacketRev32)
+                or isinstance(packet, LightSensorPacket)
+            ):
+                return
 
-        packet_data = packet.to_influx_json()
-        logging.debug(f"Sending data to influx: {packet_data}")
+            packet_data = packet.to_influx_line()
+            logging.debug("Sending data to influx: %s", packet_data)
 
-        try:
-            self.influx_client.write_points(packet_data)
+            self.influx_client.write_points(packet_data, protocol="line")
         except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
+            logging.error("Influxdb error: %s", err)
+        except Exception:
+            logging.exception("Error while archiving packet")
 
 
 if __name__ == "__main__":
@@ -9,7 +9,6 @@ import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
 
 from typing import Any
-from base64 import b64encode, b64decode
 
 from ttt.packets import (
     unmarshall,
@@ -50,9 +49,9 @@ class DummyRadio:
     def on_message(
         self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
     ) -> None:
-        logging.debug(f"Received MQTT Message on topic {message.topic}")
+        logging.debug("Received MQTT Message on topic %s", message.topic)
 
-        packet = unmarshall(b64decode(message.payload))
+        packet = unmarshall(message.payload)
         if isinstance(packet, TTCloudHeloPacket):
             logging.debug("Received TTCloudHeloPacket")
             self.initialised = True
@@ -67,7 +66,7 @@ class DummyRadio:
         logging.debug("Sending HELO-Packet")
         self.mqtt_client.publish(
             topic=f"receive/{packet.__class__.__name__}",
-            payload=b64encode(packet.marshall()),
+            payload=packet.marshall(),
         )
 
         while not self.initialised:
@@ -79,7 +78,7 @@ class DummyRadio:
         logging.debug("Entering data-send loop")
         while True:
             sleep_time = random.randint(10, 60)
-            logging.debug(f"Waiting for {sleep_time} seconds")
+            logging.debug("Waiting for %s seconds", sleep_time)
             time.sleep(sleep_time)
 
             packet = random.choice(
@@ -89,10 +88,10 @@ class DummyRadio:
                 packet, LightSensorPacket
             )
             packet.timestamp = int(time.time())
-            logging.debug(f"Sending {packet.__class__.__name__}")
+            logging.debug("Sending %s", packet.__class__.__name__)
             self.mqtt_client.publish(
                 topic=f"receive/{packet.__class__.__name__}",
-                payload=b64encode(packet.marshall()),
+                payload=packet.marshall(),
             )
 
 
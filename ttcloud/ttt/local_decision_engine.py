@@ -4,10 +4,10 @@ from __future__ import annotations
 import argparse
 import logging
 import time
-import json
 
-from typing import Any, Dict, Union
-from base64 import b64encode, b64decode
+from concurrent.futures import ThreadPoolExecutor
+from struct import pack_into
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
@@ -23,9 +23,16 @@ from ttt.packets import (
     LightSensorPacket,
 )
 from ttt.policy import DataPolicy, LightPolicy
-from ttt.util import generate_tt_address
+from ttt.util import generate_tt_address, json_dumps, json_loads, tune_influx_session
 from ttt.address import TTAddress
 
+INFLUX_FLUSH_POINTS = 100
+INFLUX_FLUSH_INTERVAL = 1.0
+
+
+def _noop_publish(topic: str, payload: Any = None) -> None:
+    pass
+
 
 class LDE:
     def __init__(
@@ -37,20 +44,56 @@ class LDE:
         always_answer: bool,
     ):
         self.address = address
-        logging.debug(f"Own address: {self.address}")
+        logging.debug("Own address: %s", self.address)
 
-        self.respond = respond
         self.always_answer = always_answer
 
-        self.mqtt_client = mqtt.Client(f"lde-{address}")
+        self.command_topic = f"command/{self.address.address}"
+
+        self.mqtt_client = mqtt.Client(f"lde-{address}", protocol=mqtt.MQTTv5)
         self.mqtt_client.connect(broker_address)
+
+        # Route messages inside paho by topic filter instead of substring
+        # matching every topic in a generic on_message; the fallback only
+        # sees messages no filter matched.
         self.mqtt_client.on_message = self.on_message
+        self.mqtt_client.message_callback_add("global/#", self._handle_global_state)
+        self.mqtt_client.message_callback_add(
+            f"receive/{self.address.address}", self._handle_packet
+        )
+        self.mqtt_client.message_callback_add(
+            f"helo/response/{self.address.address}", self._handle_helo_response
+        )
+
+        # Telemetry topics run at QoS 0: losing a reading is acceptable and
+        # skipping the PUBACK round-trip keeps up with high packet rates.
+        # Connection handshakes stay at QoS 1. One subscribe call sends a
+        # single SUBSCRIBE packet for all three filters.
+        self.mqtt_client.subscribe(
+            [
+                ("global/#", 0),
+                (f"receive/{self.address.address}", 0),
+                (f"helo/response/{self.address.address}", 1),
+            ]
+        )
+
+        # Specialise away the respond flag: publishes go through a bound
+        # method chosen once here, so the hot path has no per-packet branch.
+        self._publish_command = self.mqtt_client.publish if respond else _noop_publish
+
+        self.influx_client = influx.InfluxDBClient(
+            host=influx_address, port=8086, gzip=True
+        )
+        tune_influx_session(self.influx_client)
 
-        self.mqtt_client.subscribe("global/#")
-        self.mqtt_client.subscribe(f"receive/{self.address.address}")
-        self.mqtt_client.subscribe(f"helo/response/{self.address.address}")
+        # Buffered as line-protocol strings: cheaper to build than the
+        # JSON point dicts and written out verbatim by the client.
+        self.influx_buffer: List[str] = []
+        self.last_flush = time.monotonic()
 
-        self.influx_client = influx.InfluxDBClient(host=influx_address, port=8086)
+        # Flushes run on a background worker so the MQTT callback thread
+        # never waits for the influx HTTP round-trip.
+        self.write_pool = ThreadPoolExecutor(max_workers=2)
 
         self.data_policy = DataPolicy(
             local_address=address,
@@ -65,41 +108,58 @@ class LDE:
             local_address=address, influx_client=self.influx_client
         )
 
-        self.connected_clients: Dict[TTAddress, int] = {}
+        # One dict lookup on the concrete type replaces the isinstance
+        # chain that walked the MRO for every received packet.
+        self.packet_handlers: Dict[type, Callable[..., Optional[TTPacket]]] = {
+            TTHeloPacket: self._on_helo,
+            DataPacketRev31: self._on_data,
+            DataPacketRev32: self._on_data,
+            LightSensorPacket: self._on_light,
+        }
+
+        # Keyed by the raw int address: int hashing is C-level, while
+        # TTAddress keys would pay a Python __hash__/__eq__ per lookup.
+        self.connected_clients: Dict[int, int] = {}
         self.time_slot = 1
 
+        # Pre-marshalled HELO reply; sender and command never change, so
+        # each reply only patches the receiver and time fields at their
+        # offsets in the "=IIBBI" layout.
+        self.cloud_helo_template = bytearray(
+            TTCloudHeloPacket(
+                receiver_address=TTAddress(address=0),
+                sender_address=self.address,
+                command=190,
+                time=0,
+            ).marshall()
+        )
+
     def __enter__(self) -> LDE:
-        self.mqtt_client.loop_start()
         self.influx_client.create_database("ttt")
         self.influx_client.switch_database("ttt")
+        self.data_policy.prime_regression_state()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        self.mqtt_client.loop_stop()
+        self._flush()
         self.mqtt_client.disconnect(
             reasoncode=mqtt.ReasonCodes(
                 packetType=PacketTypes.DISCONNECT, aName="Normal disconnection"
             )
         )
+        self.write_pool.shutdown(wait=True)
         self.influx_client.close()
 
     def on_message(
         self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
     ) -> None:
-        logging.debug(f"Received MQTT Message on topic {message.topic}")
-
-        if "receive" in message.topic:
-            self._handle_packet(message)
-        elif "global" in message.topic:
-            self._handle_global_state(message)
-        elif "helo/response" in message.topic:
-            self._handle_helo_response(message)
-        else:
-            logging.error(f"Received message from unknown topic {message.topic}")
+        logging.error("Received message from unknown topic %s", message.topic)
 
-    def _handle_helo_response(self, message: mqtt.MQTTMessage) -> None:
-        response: Dict[str, Union[int, bool]] = json.loads(message.payload)
-        logging.debug(f"Received connection response: {response}")
+    def _handle_helo_response(
+        self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
+    ) -> None:
+        response: Dict[str, Union[int, bool]] = json_loads(message.payload)
+        logging.debug("Received connection response: %s", response)
         connect: bool = response["connect"]
         if not connect:
             logging.debug("Backend told us not to connect")
@@ -107,136 +167,168 @@ class LDE:
 
         tt_address = TTAddress(address=response["tt_address"])
 
-        cloud_helo = TTCloudHeloPacket(
-            receiver_address=tt_address,
-            sender_address=self.address,
-            command=190,
-            time=int(time.time()),
-        )
+        pack_into("=I", self.cloud_helo_template, 0, tt_address.address)
+        pack_into("=I", self.cloud_helo_template, 10, int(time.time()))
+        cloud_helo = bytes(self.cloud_helo_template)
 
-        logging.debug(f"Sending response packet: {cloud_helo}")
+        logging.debug("Sending response packet: %s", cloud_helo.hex())
 
-        if self.respond:
-            self.mqtt_client.publish(
-                topic=f"command/{self.address.address}",
-                payload=b64encode(cloud_helo.marshall()),
-            )
+        self._publish_command(
+            topic=self.command_topic,
+            payload=cloud_helo,
+        )
 
         self._add_tt_to_connected(address=tt_address)
 
     def _add_tt_to_connected(self, address: TTAddress) -> None:
-        logging.debug(f"Adding tt {address} to connected nodes")
+        logging.debug("Adding tt %s to connected nodes", address)
 
-        if address in self.connected_clients:
+        if address.address in self.connected_clients:
             logging.debug(
-                f"tt {address} already tracked, has timeslot {self.connected_clients[address]}"
+                "tt %s already tracked, has timeslot %s",
+                address,
+                self.connected_clients[address.address],
             )
             return
 
-        self.connected_clients[address] = self.time_slot
+        self.connected_clients[address.address] = self.time_slot
         self.time_slot += 1
 
         logging.debug(
-            f"Node {address} now has timeslot {self.connected_clients[address]}"
+            "Node %s now has timeslot %s",
+            address,
+            self.connected_clients[address.address],
         )
 
-    def _handle_global_state(self, message: mqtt.MQTTMessage) -> None:
+    def _handle_global_state(
+        self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
+    ) -> None:
         logging.debug("Received global state message")
         if "movement" in message.topic:
-            data: Dict[str, float] = json.loads(message.payload)
-            logging.debug(f"Received aggregated movement data: {data}")
-            self.data_policy.aggregated_movement = data
+            data: Dict[str, float] = json_loads(message.payload)
+            logging.debug("Received aggregated movement data: %s", data)
+            self.data_policy.update_aggregated_movement(data)
         elif "temperature" in message.topic:
-            data: Dict[str, float] = json.loads(message.payload)
-            logging.debug(f"Received aggregated temperature data: {data}")
-            self.data_policy.aggregated_temperature = data
+            data: Dict[str, float] = json_loads(message.payload)
+            logging.debug("Received aggregated temperature data: %s", data)
+            self.data_policy.update_aggregated_temperature(data)
         else:
-            logging.error(f"Unknown topic: {message.topic}")
+            logging.error("Unknown topic: %s", message.topic)
 
-    def _handle_packet(self, message: mqtt.MQTTMessage) -> None:
+    def _handle_packet(
+        self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
+    ) -> None:
         logging.debug("Received packet message")
 
-        packet: TTPacket = unmarshall(b64decode(message.payload))
-        logging.debug(f"Unamarshalled packet: {packet}")
+        packet: TTPacket = unmarshall(message.payload)
+        logging.debug("Unamarshalled packet: %s", packet)
 
         if packet.receiver_address.address == 1246382666:
             logging.debug(
-                f"Received multicast message addressed to {packet.receiver_address.address}"
+                "Received multicast message addressed to %s",
+                packet.receiver_address.address,
             )
         elif packet.receiver_address == self.address or self.always_answer:
             logging.debug("Received unicast message addressed to us")
-            if packet.sender_address not in self.connected_clients:
+            if packet.sender_address.address not in self.connected_clients:
                 logging.debug(
-                    f"Node {packet.sender_address} sent us a unicast, but is not connected."
+                    "Node %s sent us a unicast, but is not connected.",
+                    packet.sender_address,
                 )
                 self._add_tt_to_connected(packet.sender_address)
         else:
             logging.debug(
-                f"Received unicast message addressed to someone else ({packet.receiver_address})"
+                "Received unicast message addressed to someone else (%s)",
+                packet.receiver_address,
             )
             return
 
-        if isinstance(packet, TTHeloPacket):
-            self._on_helo(packet=packet)
-            return
-        elif isinstance(packet, DataPacketRev31) or isinstance(packet, DataPacketRev32):
-            reply = self._on_data(packet=packet)
-        elif isinstance(packet, LightSensorPacket):
-            reply = self._on_light(packet=packet)
-        else:
+        handler = self.packet_handlers.get(type(packet))
+        if handler is None:
             logging.error("Unsupported packet type")
             return
 
-        logging.debug(f"Reply: {reply}")
+        reply = handler(packet=packet)
+        if reply is None:
+            return
 
-        if self.respond:
-            self.mqtt_client.publish(
-                topic=f"command/{self.address.address}",
-                payload=b64encode(reply.marshall()),
-            )
+        logging.debug("Reply: %s", reply)
 
-    def _on_helo(self, packet: TTHeloPacket) -> None:
-        logging.debug(f"Received HELO-Request: {packet}")
+        self._publish_command(
+            topic=self.command_topic,
+            payload=reply.marshall(),
+        )
+
+    def _on_helo(self, packet: TTHeloPacket) -> Optional[TTPacket]:
+        logging.debug("Received HELO-Request: %s", packet)
         request: Dict[str, int] = {
             "cloud_address": self.address.address,
             "tt_address": packet.sender_address.address,
         }
-        if self.respond:
-            logging.debug(f"Sending connection request to backend: {request}")
-            self.mqtt_client.publish(topic="helo/request", payload=json.dumps(request))
+        logging.debug("Sending connection request to backend: %s", request)
+        self._publish_command(topic="helo/request", payload=json_dumps(request))
 
     def _on_data(self, packet: Union[DataPacketRev31, DataPacketRev32]) -> TTPacket:
         logging.debug("Received data packet")
         reply = self.data_policy.evaluate(packet)
-        reply.time_slot = self.connected_clients.get(reply.receiver_address, 0)
+        reply.time_slot = self.connected_clients.get(reply.receiver_address.address, 0)
 
-        packet_data = packet.to_influx_json()
-        logging.debug(f"Sending data to influx: {packet_data}")
+        packet_data = packet.to_influx_line()
+        logging.debug("Buffering data for influx: %s", packet_data)
 
-        try:
-            self.influx_client.write_points(packet_data)
-        except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
+        self.influx_buffer.extend(packet_data)
+        self._maybe_flush()
 
         return reply
 
     def _on_light(self, packet: LightSensorPacket) -> TTPacket:
         reply = self.light_policy.evaluate(packet)
 
-        packet_data = packet.to_influx_json()
-        logging.debug(f"Sending data to influx: {packet_data}")
+        packet_data = packet.to_influx_line()
+        logging.debug("Buffering data for influx: %s", packet_data)
 
-        try:
-            self.influx_client.write_points(packet_data)
-        except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
+        self.influx_buffer.extend(packet_data)
+        self._maybe_flush()
 
         return reply
 
+    def _maybe_flush(self) -> None:
+        if (
+            len(self.influx_buffer) < INFLUX_FLUSH_POINTS
+            and time.monotonic() - self.last_flush < INFLUX_FLUSH_INTERVAL
+        ):
+            return
+
+        self._flush()
+
+    def _flush(self) -> None:
+        if not self.influx_buffer:
+            return
+
+        points = self.influx_buffer
+        self.influx_buffer = []
+        self.last_flush = time.monotonic()
+
+        logging.debug("Flushing %s points to influx", len(points))
+
+        self.write_pool.submit(self._write_points, points)
+
+    def _write_points(self, points: List[str]) -> None:
+        # Runs on the write pool whose futures nobody inspects; log every
+        # failure here so flushes cannot fail silently.
+        try:
+            self.influx_client.write_points(points, protocol="line", batch_size=5000)
+        except influx.client.InfluxDBServerError as err:
+            logging.error("Influxdb error: %s", err)
+        except Exception:
+            logging.exception("Error while writing points to influx")
+
     def start(self):
         logging.info("Starting Local Decision Engine")
-        while True:
-            time.sleep(0.5)
+        try:
+            self.mqtt_client.loop_forever(retry_first_connection=True)
+        except KeyboardInterrupt:
+            logging.info("Stopping Local Decision Engine")
 
 
 if __name__ == "__main__":
@@ -7,14 +7,18 @@ from __future__ import annotations
 
 import argparse
 import logging
-import json
 
+from array import array
 from typing import Any, Dict, Union
-from time import sleep
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
 
+from ttt.util import json_dumps, json_loads
+
+ASSIGNMENT_TABLE_SIZE = 1 << 20
+ASSIGNMENT_TABLE_MASK = ASSIGNMENT_TABLE_SIZE - 1
+
 
 class Coordinator:
     def __init__(self, broker_address: str, broker_port: int) -> None:
@@ -23,17 +27,19 @@ class Coordinator:
         self.mqtt_client.on_message = self.on_message
         self.mqtt_client.subscribe("helo/request")
 
-        # keys: tt_address, val: cloud_address
-        self.assignments: Dict[int, int] = {}
+        # Flat open-addressed table indexed by the low bits of the tt
+        # address: two packed uint64 arrays instead of a Dict[int, int],
+        # which costs dozens of bytes per entry at fleet scale. Slot owners
+        # disambiguate hash collisions; colliding (or zero) tt addresses
+        # spill into a small overflow dict.
+        self.assignment_owners = array("Q", bytes(8 * ASSIGNMENT_TABLE_SIZE))
+        self.assignment_clouds = array("Q", bytes(8 * ASSIGNMENT_TABLE_SIZE))
+        self.assignment_overflow: Dict[int, int] = {}
 
     def __enter__(self) -> Coordinator:
-        logging.info("Starting coordinator")
-        self.mqtt_client.loop_start()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        logging.info("Stopping coordinator")
-        self.mqtt_client.loop_stop()
         self.mqtt_client.disconnect(
             reasoncode=mqtt.ReasonCodes(
                 packetType=PacketTypes.DISCONNECT, aName="Normal disconnection"
@@ -43,35 +49,66 @@ class Coordinator:
     def on_message(
         self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
     ) -> None:
-        logging.debug(f"Received MQTT Message on topic {message.topic}")
+        logging.debug("Received MQTT Message on topic %s", message.topic)
 
-        request: Dict[str, int] = json.loads(message.payload)
-        logging.debug(f"Received connection request: {request}")
+        request: Dict[str, int] = json_loads(message.payload)
+        logging.debug("Received connection request: %s", request)
         cloud_address = request["cloud_address"]
         tt_address = request["tt_address"]
 
-        assignment: Union[int, None] = self.assignments.get(tt_address)
-        logging.debug(f"Assignment for tt {tt_address}: {assignment}")
-
-        if assignment is None:
-            connect = True
-            self.assignments[tt_address] = cloud_address
-        else:
-            connect = assignment == cloud_address
+        connect = self._get_or_assign(tt_address, cloud_address)
 
-        logging.debug(f"Should connect: {connect}")
+        logging.debug("Should connect: %s", connect)
 
         response: Dict[str, Union[int, bool]] = {
             "tt_address": tt_address,
             "connect": connect,
         }
 
-        logging.debug(f"Sending response: {response}")
+        logging.debug("Sending response: %s", response)
 
         self.mqtt_client.publish(
-            topic=f"helo/response/{cloud_address}", payload=json.dumps(response)
+            topic=f"helo/response/{cloud_address}", payload=json_dumps(response)
         )
 
+    def _get_or_assign(self, tt_address: int, cloud_address: int) -> bool:
+        """Assign the tt to the cloud if it is still unassigned.
+
+        Returns whether the tt should connect to this cloud, i.e. whether
+        its recorded assignment (new or old) matches cloud_address.
+        """
+        slot = tt_address & ASSIGNMENT_TABLE_MASK
+        owner = self.assignment_owners[slot]
+
+        if owner == tt_address and tt_address != 0:
+            assignment = self.assignment_clouds[slot]
+            logging.debug("Assignment for tt %s: %s", tt_address, assignment)
+            return assignment == cloud_address
+
+        if owner == 0 and tt_address != 0:
+            logging.debug("Assignment for tt %s: None", tt_address)
+            self.assignment_owners[slot] = tt_address
+            self.assignment_clouds[slot] = cloud_address
+            return True
+
+        assignment = self.assignment_overflow.get(tt_address)
+        logging.debug("Assignment for tt %s: %s", tt_address, assignment)
+
+        if assignment is None:
+            self.assignment_overflow[tt_address] = cloud_address
+            return True
+
+        return assignment == cloud_address
+
+    def start(self) -> None:
+        logging.info("Starting coordinator")
+        try:
+            # Run the network loop on the main thread instead of paying for
+            # an extra loop_start() thread next to a sleeping main loop.
+            self.mqtt_client.loop_forever(retry_first_connection=True)
+        except KeyboardInterrupt:
+            logging.info("Stopping coordinator")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Assign treetalkers to ttclouds")
@@ -103,6 +140,5 @@ if __name__ == "__main__":
     with Coordinator(
         broker_address=args.broker,
         broker_port=args.broker_port,
-    ):
-        while True:
-            sleep(0.5)
+    ) as coordinator:
+        coordinator.start()
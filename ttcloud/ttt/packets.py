@@ -1,25 +1,87 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from io import BytesIO
-from struct import unpack, pack
+from functools import lru_cache
+from struct import Struct
 from typing import Dict, Callable, List, Any, Tuple
 
+import numpy as np
+
 from ttt.util import (
     compute_battery_voltage_rev_3_2,
     compute_battery_voltage_rev_3_1,
     compute_temperature,
+    compute_temperatures,
+    mV_BANDGAP,
 )
 from ttt.address import TTAddress
 
 
-@dataclass
+@lru_cache(maxsize=1024)
+def _data_tags(address: int, revision: int) -> Dict[str, int]:
+    """Shared tag dict for a (treetalker, revision) pair.
+
+    The pool of senders on a gateway is tiny, so the six measurements of
+    every data packet reuse one cached dict instead of allocating six.
+    Callers must treat the returned dict as read-only."""
+    return {"treetalker": address, "revision": revision}
+
+
+@lru_cache(maxsize=1024)
+def _data_tag_fragment(address: int, revision: int) -> str:
+    """Pre-rendered line-protocol tag set for a (treetalker, revision) pair."""
+    return f",treetalker={address},revision={revision}"
+
+
+def influx_line(measurement: str, tags: Dict[str, Any], fields: Dict[str, Any]) -> str:
+    """Render a single InfluxDB line-protocol entry.
+
+    Skips the client-side JSON-to-line conversion write_points would
+    otherwise do; none of our measurement names, tag keys or field keys
+    need escaping."""
+    tag_set = "".join(f",{key}={value}" for key, value in tags.items())
+    field_set = ",".join(
+        f"{key}={value}i" if isinstance(value, int) else f"{key}={value}"
+        for key, value in fields.items()
+    )
+    return f"{measurement}{tag_set} {field_set}"
+
+
+# Field keys of the larger data-packet measurements, shared by both
+# hardware revisions; building the fields dicts via dict(zip(...)) reuses
+# these interned keys instead of re-creating dict literals per call.
+STEM_TEMPERATURE_KEYS = (
+    "reference_probe_cold",
+    "reference_probe_hot",
+    "heat_probe_cold",
+    "heat_probe_hot",
+    "ttt_reference_probe_cold",
+    "ttt_reference_probe_hot",
+    "ttt_heat_probe_cold",
+    "ttt_heat_probe_hot",
+)
+
+GRAVITY_KEYS = (
+    "x_mean",
+    "x_derivation",
+    "y_mean",
+    "y_derivation",
+    "z_mean",
+    "z_derivation",
+)
+
+
+@dataclass(slots=True)
 class TTPacket:
     receiver_address: TTAddress
     sender_address: TTAddress
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> TTPacket:
         raise NotImplemented
 
@@ -29,20 +91,32 @@ class TTPacket:
     def to_influx_json(self) -> List[Dict[str, Any]]:
         raise NotImplemented
 
+    def to_influx_line(self) -> List[str]:
+        return [
+            influx_line(point["measurement"], point["tags"], point["fields"])
+            for point in self.to_influx_json()
+        ]
+
 
-@dataclass
+@dataclass(slots=True)
 class TTHeloPacket(TTPacket):
     packet_number: int
     packet_type: int = 5
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, TTHeloPacket) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=B")
+    _PACK = Struct("=IIBB")
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> TTHeloPacket:
-        packet_number: int = unpack("=B", raw_stream.read())[0]
+        packet_number: int = cls._UNPACK.unpack_from(buf, offset)[0]
         return cls(
             receiver_address=receiver_address,
             sender_address=sender_address,
@@ -50,8 +124,7 @@ class TTHeloPacket(TTPacket):
         )
 
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBB",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
@@ -59,22 +132,28 @@ class TTHeloPacket(TTPacket):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class TTCloudHeloPacket(TTPacket):
     command: int
     time: int
     packet_type: int = 65
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, TTCloudHeloPacket) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=BI")
+    _PACK = Struct("=IIBBI")
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> TTCloudHeloPacket:
         command: int
         cloud_time: int
-        command, cloud_time = unpack("=BI", raw_stream.read())
+        command, cloud_time = cls._UNPACK.unpack_from(buf, offset)
         return cls(
             receiver_address=receiver_address,
             sender_address=sender_address,
@@ -83,8 +162,7 @@ class TTCloudHeloPacket(TTPacket):
         )
 
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBBI",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
@@ -93,7 +171,7 @@ class TTCloudHeloPacket(TTPacket):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class DataPacketRev32(TTPacket):
     packet_number: int
     timestamp: int
@@ -116,61 +194,114 @@ class DataPacketRev32(TTPacket):
     adc_volt_bat: int
     packet_type: int = 77
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, DataPacketRev32) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=BIIIIIBBhhhhhhhIIHI")
+    _PACK = Struct("=IIBBIIIIIBBhhhhhhhIIHI")
+
+    # Structured overlay of the packet body (the "=BIIIIIBBhhhhhhhIIHI"
+    # layout) for decoding whole bursts with one C call in
+    # unmarshall_batch.
+    _BODY_DTYPE = np.dtype(
+        [
+            ("packet_number", "u1"),
+            ("timestamp", "<u4"),
+            ("temperature_reference_cold", "<u4"),
+            ("temperature_heat_cold", "<u4"),
+            ("growth_sensor", "<u4"),
+            ("adc_bandgap", "<u4"),
+            ("number_of_bits", "u1"),
+            ("air_relative_humidity", "u1"),
+            ("air_temperature", "<i2"),
+            ("gravity_x_mean", "<i2"),
+            ("gravity_y_mean", "<i2"),
+            ("gravity_z_mean", "<i2"),
+            ("gravity_x_derivation", "<i2"),
+            ("gravity_y_derivation", "<i2"),
+            ("gravity_z_derivation", "<i2"),
+            ("temperature_reference_hot", "<u4"),
+            ("temperature_heat_hot", "<u4"),
+            ("StWC", "<u2"),
+            ("adc_volt_bat", "<u4"),
+        ]
+    )
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> DataPacketRev32:
-        fields = unpack("=BIIIIIBBhhhhhhhIIHI", raw_stream.read())
-        packet_number: int = fields[0]
-        timestamp: int = fields[1]
-        temperature_reference_cold: int = fields[2]
-        temperature_heat_cold: int = fields[3]
-        growth_sensor: int = fields[4]
-        adc_bandgap: int = fields[5]
-        number_of_bits: int = fields[6]
-        air_relative_humidity: int = fields[7]
-        air_temperature: int = fields[8]
-        gravity_x_mean: int = fields[9]
-        gravity_y_mean: int = fields[10]
-        gravity_z_mean: int = fields[11]
-        gravity_x_derivation: int = fields[12]
-        gravity_y_derivation: int = fields[13]
-        gravity_z_derivation: int = fields[14]
-        temperature_reference_hot: int = fields[15]
-        temperature_heat_hot: int = fields[16]
-        StWC: int = fields[17]
-        adc_volt_bat: int = fields[18]
+        fields = cls._UNPACK.unpack_from(buf, offset)
 
         return cls(
             receiver_address=receiver_address,
             sender_address=sender_address,
-            packet_number=packet_number,
-            timestamp=timestamp,
-            temperature_reference_cold=temperature_reference_cold,
-            temperature_heat_cold=temperature_heat_cold,
-            growth_sensor=growth_sensor,
-            adc_bandgap=adc_bandgap,
-            number_of_bits=number_of_bits,
-            air_relative_humidity=air_relative_humidity,
-            air_temperature=air_temperature,
-            gravity_z_mean=gravity_z_mean,
-            gravity_z_derivation=gravity_z_derivation,
-            gravity_y_mean=gravity_y_mean,
-            gravity_y_derivation=gravity_y_derivation,
-            gravity_x_mean=gravity_x_mean,
-            gravity_x_derivation=gravity_x_derivation,
-            StWC=StWC,
-            adc_volt_bat=adc_volt_bat,
-            temperature_reference_hot=temperature_reference_hot,
-            temperature_heat_hot=temperature_heat_hot,
+            packet_number=fields[0],
+            timestamp=fields[1],
+            temperature_reference_cold=fields[2],
+            temperature_heat_cold=fields[3],
+            growth_sensor=fields[4],
+            adc_bandgap=fields[5],
+            number_of_bits=fields[6],
+            air_relative_humidity=fields[7],
+            air_temperature=fields[8],
+            gravity_x_mean=fields[9],
+            gravity_y_mean=fields[10],
+            gravity_z_mean=fields[11],
+            gravity_x_derivation=fields[12],
+            gravity_y_derivation=fields[13],
+            gravity_z_derivation=fields[14],
+            temperature_reference_hot=fields[15],
+            temperature_heat_hot=fields[16],
+            StWC=fields[17],
+            adc_volt_bat=fields[18],
         )
 
+    @classmethod
+    def unmarshall_batch(
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        blob: bytes,
+    ) -> List[DataPacketRev32]:
+        """Decode a burst of concatenated packet bodies sharing one header.
+
+        np.frombuffer overlays the structured dtype on the whole blob, so
+        all records are decoded by a single C call instead of one
+        Struct.unpack per packet."""
+        records = np.frombuffer(blob, dtype=cls._BODY_DTYPE)
+        return [
+            cls(
+                receiver_address=receiver_address,
+                sender_address=sender_address,
+                packet_number=fields[0],
+                timestamp=fields[1],
+                temperature_reference_cold=fields[2],
+                temperature_heat_cold=fields[3],
+                growth_sensor=fields[4],
+                adc_bandgap=fields[5],
+                number_of_bits=fields[6],
+                air_relative_humidity=fields[7],
+                air_temperature=fields[8],
+                gravity_x_mean=fields[9],
+                gravity_y_mean=fields[10],
+                gravity_z_mean=fields[11],
+                gravity_x_derivation=fields[12],
+                gravity_y_derivation=fields[13],
+                gravity_z_derivation=fields[14],
+                temperature_reference_hot=fields[15],
+                temperature_heat_hot=fields[16],
+                StWC=fields[17],
+                adc_volt_bat=fields[18],
+            )
+            for fields in records.tolist()
+        ]
+
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBBIIIIIBBhhhhhhhIIHI",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
@@ -196,72 +327,71 @@ class DataPacketRev32(TTPacket):
         )
 
     def to_influx_json(self) -> List[Dict[str, Any]]:
+        return self._influx_points(
+            ttt_reference_cold=compute_temperature(self.temperature_reference_cold),
+            ttt_reference_hot=compute_temperature(self.temperature_reference_hot),
+            ttt_heat_cold=compute_temperature(self.temperature_heat_cold),
+            ttt_heat_hot=compute_temperature(self.temperature_heat_hot),
+            ttt_voltage=compute_battery_voltage_rev_3_2(
+                adc_volt_bat=self.adc_volt_bat, adc_bandgap=self.adc_bandgap
+            ),
+        )
+
+    def _influx_points(
+        self,
+        ttt_reference_cold: float,
+        ttt_reference_hot: float,
+        ttt_heat_cold: float,
+        ttt_heat_hot: float,
+        ttt_voltage: float,
+    ) -> List[Dict[str, Any]]:
+        tags = _data_tags(self.sender_address.address, 32)
         return [
             {
                 "measurement": "stem_temperature",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 32,
-                },
-                "fields": {
-                    "reference_probe_cold": self.temperature_reference_cold,
-                    "reference_probe_hot": self.temperature_reference_hot,
-                    "heat_probe_cold": self.temperature_heat_cold,
-                    "heat_probe_hot": self.temperature_heat_hot,
-                    "ttt_reference_probe_cold": compute_temperature(
-                        self.temperature_reference_cold
-                    ),
-                    "ttt_reference_probe_hot": compute_temperature(
-                        self.temperature_reference_hot
-                    ),
-                    "ttt_heat_probe_cold": compute_temperature(
-                        self.temperature_heat_cold
-                    ),
-                    "ttt_heat_probe_hot": compute_temperature(
-                        self.temperature_heat_hot
-                    ),
-                },
+                "tags": tags,
+                "fields": dict(
+                    zip(
+                        STEM_TEMPERATURE_KEYS,
+                        (
+                            self.temperature_reference_cold,
+                            self.temperature_reference_hot,
+                            self.temperature_heat_cold,
+                            self.temperature_heat_hot,
+                            ttt_reference_cold,
+                            ttt_reference_hot,
+                            ttt_heat_cold,
+                            ttt_heat_hot,
+                        ),
+                    )
+                ),
             },
             {
                 "measurement": "growth",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 32,
-                },
+                "tags": tags,
                 "fields": {
                     "distance": self.growth_sensor,
                 },
             },
             {
                 "measurement": "power",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 32,
-                },
+                "tags": tags,
                 "fields": {
                     "bandgap": self.adc_bandgap,
                     "voltage": self.adc_volt_bat,
-                    "ttt_voltage": compute_battery_voltage_rev_3_2(
-                        adc_volt_bat=self.adc_volt_bat, adc_bandgap=self.adc_bandgap
-                    ),
+                    "ttt_voltage": ttt_voltage,
                 },
             },
             {
                 "measurement": "stem_water",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 32,
-                },
+                "tags": tags,
                 "fields": {
                     "content": self.StWC,
                 },
             },
             {
                 "measurement": "air",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 32,
-                },
+                "tags": tags,
                 "fields": {
                     "temperature": self.air_temperature,
                     "humidity": self.air_relative_humidity,
@@ -269,23 +399,103 @@ class DataPacketRev32(TTPacket):
             },
             {
                 "measurement": "gravity",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 32,
-                },
-                "fields": {
-                    "x_mean": self.gravity_x_mean,
-                    "x_derivation": self.gravity_x_derivation,
-                    "y_mean": self.gravity_y_mean,
-                    "y_derivation": self.gravity_y_derivation,
-                    "z_mean": self.gravity_z_mean,
-                    "z_derivation": self.gravity_z_derivation,
-                },
+                "tags": tags,
+                "fields": dict(
+                    zip(
+                        GRAVITY_KEYS,
+                        (
+                            self.gravity_x_mean,
+                            self.gravity_x_derivation,
+                            self.gravity_y_mean,
+                            self.gravity_y_derivation,
+                            self.gravity_z_mean,
+                            self.gravity_z_derivation,
+                        ),
+                    )
+                ),
             },
         ]
 
+    def to_influx_line(self) -> List[str]:
+        # Specialised fast path: formats the line-protocol entries
+        # directly instead of materialising the to_influx_json dicts
+        # first. Must stay in sync with _influx_points.
+        tags = _data_tag_fragment(self.sender_address.address, 32)
+        return [
+            (
+                f"stem_temperature{tags} "
+                f"reference_probe_cold={self.temperature_reference_cold}i,"
+                f"reference_probe_hot={self.temperature_reference_hot}i,"
+                f"heat_probe_cold={self.temperature_heat_cold}i,"
+                f"heat_probe_hot={self.temperature_heat_hot}i,"
+                f"ttt_reference_probe_cold={compute_temperature(self.temperature_reference_cold)},"
+                f"ttt_reference_probe_hot={compute_temperature(self.temperature_reference_hot)},"
+                f"ttt_heat_probe_cold={compute_temperature(self.temperature_heat_cold)},"
+                f"ttt_heat_probe_hot={compute_temperature(self.temperature_heat_hot)}"
+            ),
+            f"growth{tags} distance={self.growth_sensor}i",
+            (
+                f"power{tags} bandgap={self.adc_bandgap}i,"
+                f"voltage={self.adc_volt_bat}i,"
+                f"ttt_voltage={compute_battery_voltage_rev_3_2(adc_volt_bat=self.adc_volt_bat, adc_bandgap=self.adc_bandgap)}"
+            ),
+            f"stem_water{tags} content={self.StWC}i",
+            (
+                f"air{tags} temperature={self.air_temperature}i,"
+                f"humidity={self.air_relative_humidity}i"
+            ),
+            (
+                f"gravity{tags} x_mean={self.gravity_x_mean}i,"
+                f"x_derivation={self.gravity_x_derivation}i,"
+                f"y_mean={self.gravity_y_mean}i,"
+                f"y_derivation={self.gravity_y_derivation}i,"
+                f"z_mean={self.gravity_z_mean}i,"
+                f"z_derivation={self.gravity_z_derivation}i"
+            ),
+        ]
+
 
-@dataclass
+def to_influx_json_batch(packets: List[DataPacketRev32]) -> List[Dict[str, Any]]:
+    """Flatten a batch of rev-3.2 packets into influx points.
+
+    All temperature channels and battery voltages of the batch are
+    converted in single vectorised passes instead of five scalar calls
+    per packet."""
+    count = len(packets)
+    ttt_reference_cold = compute_temperatures(
+        np.fromiter((p.temperature_reference_cold for p in packets), np.float64, count)
+    )
+    ttt_reference_hot = compute_temperatures(
+        np.fromiter((p.temperature_reference_hot for p in packets), np.float64, count)
+    )
+    ttt_heat_cold = compute_temperatures(
+        np.fromiter((p.temperature_heat_cold for p in packets), np.float64, count)
+    )
+    ttt_heat_hot = compute_temperatures(
+        np.fromiter((p.temperature_heat_hot for p in packets), np.float64, count)
+    )
+    ttt_voltage = (
+        2
+        * mV_BANDGAP
+        * np.fromiter((p.adc_volt_bat for p in packets), np.float64, count)
+        / np.fromiter((p.adc_bandgap for p in packets), np.float64, count)
+    )
+
+    points: List[Dict[str, Any]] = []
+    for index, packet in enumerate(packets):
+        points.extend(
+            packet._influx_points(
+                ttt_reference_cold=ttt_reference_cold[index],
+                ttt_reference_hot=ttt_reference_hot[index],
+                ttt_heat_cold=ttt_heat_cold[index],
+                ttt_heat_hot=ttt_heat_hot[index],
+                ttt_voltage=ttt_voltage[index],
+            )
+        )
+    return points
+
+
+@dataclass(slots=True)
 class DataPacketRev31(TTPacket):
     packet_number: int
     timestamp: int
@@ -307,59 +517,46 @@ class DataPacketRev31(TTPacket):
     moisture: int
     packet_type: int = 69
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, DataPacketRev31) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=BIhhIIBBhhhhhhhhhh")
+    _PACK = Struct("=IIBBIhhIIBBhhhhhhhhhh")
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> DataPacketRev31:
-        fields = unpack("=BIhhIIBBhhhhhhhhhh", raw_stream.read())
-        packet_number: int = fields[0]
-        timestamp: int = fields[1]
-        temperature_reference_cold: int = fields[2]
-        temperature_heat_cold: int = fields[3]
-        growth_sensor: int = fields[4]
-        voltage: int = fields[5]
-        number_of_bits: int = fields[6]
-        air_relative_humidity: int = fields[7]
-        air_temperature: int = fields[8]
-        gravity_x_mean: int = fields[9]
-        gravity_y_mean: int = fields[10]
-        gravity_z_mean: int = fields[11]
-        gravity_x_derivation: int = fields[12]
-        gravity_y_derivation: int = fields[13]
-        gravity_z_derivation: int = fields[14]
-        temperature_reference_hot: int = fields[15]
-        temperature_heat_hot: int = fields[16]
-        moisture: int = fields[17]
+        fields = cls._UNPACK.unpack_from(buf, offset)
 
         return cls(
             receiver_address=receiver_address,
             sender_address=sender_address,
-            packet_number=packet_number,
-            timestamp=timestamp,
-            temperature_reference_cold=temperature_reference_cold,
-            temperature_heat_cold=temperature_heat_cold,
-            growth_sensor=growth_sensor,
-            voltage=voltage,
-            number_of_bits=number_of_bits,
-            air_relative_humidity=air_relative_humidity,
-            air_temperature=air_temperature,
-            gravity_z_mean=gravity_z_mean,
-            gravity_z_derivation=gravity_z_derivation,
-            gravity_y_mean=gravity_y_mean,
-            gravity_y_derivation=gravity_y_derivation,
-            gravity_x_mean=gravity_x_mean,
-            gravity_x_derivation=gravity_x_derivation,
-            temperature_reference_hot=temperature_reference_hot,
-            temperature_heat_hot=temperature_heat_hot,
-            moisture=moisture,
+            packet_number=fields[0],
+            timestamp=fields[1],
+            temperature_reference_cold=fields[2],
+            temperature_heat_cold=fields[3],
+            growth_sensor=fields[4],
+            voltage=fields[5],
+            number_of_bits=fields[6],
+            air_relative_humidity=fields[7],
+            air_temperature=fields[8],
+            gravity_x_mean=fields[9],
+            gravity_y_mean=fields[10],
+            gravity_z_mean=fields[11],
+            gravity_x_derivation=fields[12],
+            gravity_y_derivation=fields[13],
+            gravity_z_derivation=fields[14],
+            temperature_reference_hot=fields[15],
+            temperature_heat_hot=fields[16],
+            moisture=fields[17],
         )
 
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBBIhhIIBBhhhhhhhhhh",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
@@ -384,48 +581,37 @@ class DataPacketRev31(TTPacket):
         )
 
     def to_influx_json(self) -> List[Dict[str, Any]]:
+        tags = _data_tags(self.sender_address.address, 31)
         return [
             {
                 "measurement": "stem_temperature",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 31,
-                },
-                "fields": {
-                    "reference_probe_cold": self.temperature_reference_cold,
-                    "reference_probe_hot": self.temperature_reference_hot,
-                    "heat_probe_cold": self.temperature_heat_cold,
-                    "heat_probe_hot": self.temperature_heat_hot,
-                    "ttt_reference_probe_cold": compute_temperature(
-                        self.temperature_reference_cold
-                    ),
-                    "ttt_reference_probe_hot": compute_temperature(
-                        self.temperature_reference_hot
-                    ),
-                    "ttt_heat_probe_cold": compute_temperature(
-                        self.temperature_heat_cold
-                    ),
-                    "ttt_heat_probe_hot": compute_temperature(
-                        self.temperature_heat_hot
-                    ),
-                },
+                "tags": tags,
+                "fields": dict(
+                    zip(
+                        STEM_TEMPERATURE_KEYS,
+                        (
+                            self.temperature_reference_cold,
+                            self.temperature_reference_hot,
+                            self.temperature_heat_cold,
+                            self.temperature_heat_hot,
+                            compute_temperature(self.temperature_reference_cold),
+                            compute_temperature(self.temperature_reference_hot),
+                            compute_temperature(self.temperature_heat_cold),
+                            compute_temperature(self.temperature_heat_hot),
+                        ),
+                    )
+                ),
             },
             {
                 "measurement": "growth",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 31,
-                },
+                "tags": tags,
                 "fields": {
                     "distance": self.growth_sensor,
                 },
             },
             {
                 "measurement": "power",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 31,
-                },
+                "tags": tags,
                 "fields": {
                     "voltage": self.voltage,
                     "ttt_voltage": compute_battery_voltage_rev_3_1(
@@ -435,20 +621,14 @@ class DataPacketRev31(TTPacket):
             },
             {
                 "measurement": "stem_water",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 31,
-                },
+                "tags": tags,
                 "fields": {
                     "xmc": self.moisture,
                 },
             },
             {
                 "measurement": "air",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 31,
-                },
+                "tags": tags,
                 "fields": {
                     "temperature": self.air_temperature,
                     "humidity": self.air_relative_humidity,
@@ -456,21 +636,58 @@ class DataPacketRev31(TTPacket):
             },
             {
                 "measurement": "gravity",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "revision": 31,
-                },
-                "fields": {
-                    "x_mean": self.gravity_x_mean,
-                    "x_derivation": self.gravity_x_derivation,
-                    "y_mean": self.gravity_y_mean,
-                    "y_derivation": self.gravity_y_derivation,
-                    "z_mean": self.gravity_z_mean,
-                    "z_derivation": self.gravity_z_derivation,
-                },
+                "tags": tags,
+                "fields": dict(
+                    zip(
+                        GRAVITY_KEYS,
+                        (
+                            self.gravity_x_mean,
+                            self.gravity_x_derivation,
+                            self.gravity_y_mean,
+                            self.gravity_y_derivation,
+                            self.gravity_z_mean,
+                            self.gravity_z_derivation,
+                        ),
+                    )
+                ),
             },
         ]
 
+    def to_influx_line(self) -> List[str]:
+        # Specialised fast path, mirroring to_influx_json.
+        tags = _data_tag_fragment(self.sender_address.address, 31)
+        return [
+            (
+                f"stem_temperature{tags} "
+                f"reference_probe_cold={self.temperature_reference_cold}i,"
+                f"reference_probe_hot={self.temperature_reference_hot}i,"
+                f"heat_probe_cold={self.temperature_heat_cold}i,"
+                f"heat_probe_hot={self.temperature_heat_hot}i,"
+                f"ttt_reference_probe_cold={compute_temperature(self.temperature_reference_cold)},"
+                f"ttt_reference_probe_hot={compute_temperature(self.temperature_reference_hot)},"
+                f"ttt_heat_probe_cold={compute_temperature(self.temperature_heat_cold)},"
+                f"ttt_heat_probe_hot={compute_temperature(self.temperature_heat_hot)}"
+            ),
+            f"growth{tags} distance={self.growth_sensor}i",
+            (
+                f"power{tags} voltage={self.voltage}i,"
+                f"ttt_voltage={compute_battery_voltage_rev_3_1(voltage=self.voltage)}"
+            ),
+            f"stem_water{tags} xmc={self.moisture}i",
+            (
+                f"air{tags} temperature={self.air_temperature}i,"
+                f"humidity={self.air_relative_humidity}i"
+            ),
+            (
+                f"gravity{tags} x_mean={self.gravity_x_mean}i,"
+                f"x_derivation={self.gravity_x_derivation}i,"
+                f"y_mean={self.gravity_y_mean}i,"
+                f"y_derivation={self.gravity_y_derivation}i,"
+                f"z_mean={self.gravity_z_mean}i,"
+                f"z_derivation={self.gravity_z_derivation}i"
+            ),
+        ]
+
 
 LIGHT_SENSOR_CALIBRATION_PARAMETERS: Dict[int, Tuple[float, float]] = {
     610: (-312.45, 1.6699),
@@ -488,18 +705,25 @@ LIGHT_SENSOR_CALIBRATION_PARAMETERS: Dict[int, Tuple[float, float]] = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class LightSensorPacket(TTPacket):
     packet_number: int
     timestamp: int
-    AS7263: Dict[int, int]
-    AS7262: Dict[int, int]
+    AS7263: Tuple[int, ...]
+    AS7262: Tuple[int, ...]
     integration_time: int
     gain: int
     packet_type: int = 73
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, LightSensorPacket) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=BIIIIIIIIIIIIIBB")
+    _PACK = Struct("=IIBBIIIIIIIIIIIIIBB")
+
+    # Channel readings are stored positionally; these map slot index to
+    # the wavelength of the respective sensor channel.
+    AS7263_WAVELENGTHS = (610, 680, 730, 760, 810, 860)
+    AS7262_WAVELENGTHS = (450, 500, 550, 570, 600, 650)
 
     @staticmethod
     def convert(wavelength: int, value: int) -> float:
@@ -509,96 +733,80 @@ class LightSensorPacket(TTPacket):
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> LightSensorPacket:
-        fields = unpack("=BIIIIIIIIIIIIIBB", raw_stream.read())
+        fields = cls._UNPACK.unpack_from(buf, offset)
         return LightSensorPacket(
             receiver_address=receiver_address,
             sender_address=sender_address,
             packet_number=fields[0],
             timestamp=fields[1],
-            AS7263={
-                610: fields[2],
-                680: fields[3],
-                730: fields[4],
-                760: fields[5],
-                810: fields[6],
-                860: fields[7],
-            },
-            AS7262={
-                450: fields[8],
-                500: fields[9],
-                550: fields[10],
-                570: fields[11],
-                600: fields[12],
-                650: fields[13],
-            },
+            AS7263=fields[2:8],
+            AS7262=fields[8:14],
             integration_time=fields[14],
             gain=fields[15],
         )
 
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBBIIIIIIIIIIIIIBB",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
             self.packet_number,
             self.timestamp,
-            self.AS7263[610],
-            self.AS7263[680],
-            self.AS7263[730],
-            self.AS7263[760],
-            self.AS7263[810],
-            self.AS7263[860],
-            self.AS7262[450],
-            self.AS7262[500],
-            self.AS7262[550],
-            self.AS7262[570],
-            self.AS7262[600],
-            self.AS7262[650],
+            *self.AS7263,
+            *self.AS7262,
             self.integration_time,
             self.gain,
         )
 
     def to_influx_json(self) -> List[Dict[str, Any]]:
+        tags = {
+            "treetalker": self.sender_address.address,
+            "gain": self.gain,
+            "integration_time": self.integration_time,
+        }
         return [
             {
                 "measurement": "AS7263",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "gain": self.gain,
-                    "integration_time": self.integration_time,
-                },
+                "tags": tags,
                 "fields": {
-                    "610": LightSensorPacket.convert(610, self.AS7263[610]),
-                    "680": LightSensorPacket.convert(680, self.AS7263[680]),
-                    "730": LightSensorPacket.convert(730, self.AS7263[730]),
-                    "760": LightSensorPacket.convert(760, self.AS7263[760]),
-                    "810": LightSensorPacket.convert(810, self.AS7263[810]),
-                    "860": LightSensorPacket.convert(860, self.AS7263[860]),
+                    str(wavelength): LightSensorPacket.convert(wavelength, value)
+                    for wavelength, value in zip(self.AS7263_WAVELENGTHS, self.AS7263)
                 },
             },
             {
                 "measurement": "AS7262",
-                "tags": {
-                    "treetalker": self.sender_address.address,
-                    "gain": self.gain,
-                    "integration_time": self.integration_time,
-                },
+                "tags": tags,
                 "fields": {
-                    "450": LightSensorPacket.convert(450, self.AS7262[450]),
-                    "500": LightSensorPacket.convert(500, self.AS7262[500]),
-                    "550": LightSensorPacket.convert(550, self.AS7262[550]),
-                    "570": LightSensorPacket.convert(570, self.AS7262[570]),
-                    "600": LightSensorPacket.convert(600, self.AS7262[600]),
-                    "650": LightSensorPacket.convert(650, self.AS7262[650]),
+                    str(wavelength): LightSensorPacket.convert(wavelength, value)
+                    for wavelength, value in zip(self.AS7262_WAVELENGTHS, self.AS7262)
                 },
             },
         ]
 
+    def to_influx_line(self) -> List[str]:
+        # Specialised fast path, mirroring to_influx_json.
+        tags = (
+            f",treetalker={self.sender_address.address}"
+            f",gain={self.gain},integration_time={self.integration_time}"
+        )
+        as7263 = ",".join(
+            f"{wavelength}={LightSensorPacket.convert(wavelength, value)}"
+            for wavelength, value in zip(self.AS7263_WAVELENGTHS, self.AS7263)
+        )
+        as7262 = ",".join(
+            f"{wavelength}={LightSensorPacket.convert(wavelength, value)}"
+            for wavelength, value in zip(self.AS7262_WAVELENGTHS, self.AS7262)
+        )
+        return [f"AS7263{tags} {as7263}", f"AS7262{tags} {as7262}"]
+
 
-@dataclass
+@dataclass(slots=True)
 class TTCommand1(TTPacket):
     command: int
     time: int
@@ -609,14 +817,20 @@ class TTCommand1(TTPacket):
     time_slot_length: int
     packet_type: int = 66
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, TTCommand1) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=BIHHHBB")
+    _PACK = Struct("=IIBBIHHHBB")
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> TTCommand1:
-        fields = unpack("=BIHHHBB", raw_stream.read())
+        fields = cls._UNPACK.unpack_from(buf, offset)
         return TTCommand1(
             receiver_address=receiver_address,
             sender_address=sender_address,
@@ -630,8 +844,7 @@ class TTCommand1(TTPacket):
         )
 
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBBIHHHBB",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
@@ -645,7 +858,7 @@ class TTCommand1(TTPacket):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class TTCommand2(TTPacket):
     command: int
     time: int
@@ -653,14 +866,20 @@ class TTCommand2(TTPacket):
     gain: int
     packet_type: int = 74
 
-    def __eq__(self, other) -> bool:
-        return isinstance(other, TTCommand2) and self.__dict__ == other.__dict__
+    # Struct instances are parsed once at import; pack/unpack on them
+    # skip the per-call format parsing and format cache lookup.
+    _UNPACK = Struct("=BIBB")
+    _PACK = Struct("=IIBBIBB")
 
     @classmethod
     def unmarshall(
-        cls, receiver_address: TTAddress, sender_address: TTAddress, raw_stream: BytesIO
+        cls,
+        receiver_address: TTAddress,
+        sender_address: TTAddress,
+        buf: memoryview,
+        offset: int = 9,
     ) -> TTCommand2:
-        fields = unpack("=BIBB", raw_stream.read())
+        fields = cls._UNPACK.unpack_from(buf, offset)
         return TTCommand2(
             receiver_address=receiver_address,
             sender_address=sender_address,
@@ -671,8 +890,7 @@ class TTCommand2(TTPacket):
         )
 
     def marshall(self) -> bytes:
-        return pack(
-            "=IIBBIBB",
+        return self._PACK.pack(
             self.receiver_address.address,
             self.sender_address.address,
             self.packet_type,
@@ -683,7 +901,7 @@ class TTCommand2(TTPacket):
         )
 
 
-PACKET_TYPES: Dict[int, Callable[[TTAddress, TTAddress, BytesIO], TTPacket]] = {
+PACKET_TYPES: Dict[int, Callable[[TTAddress, TTAddress, memoryview, int], TTPacket]] = {
     5: TTHeloPacket.unmarshall,
     65: TTCloudHeloPacket.unmarshall,
     66: TTCommand1.unmarshall,
@@ -694,22 +912,50 @@ PACKET_TYPES: Dict[int, Callable[[TTAddress, TTAddress, BytesIO], TTPacket]] = {
 }
 
 
+# Flat dispatch table indexed directly by the packet_type byte: a C-level
+# list index instead of a dict hash/probe on the hottest entrypoint.
+_DISPATCH: Tuple = tuple(
+    PACKET_TYPES.get(packet_type) for packet_type in range(max(PACKET_TYPES) + 1)
+)
+
+_HEADER = Struct("=IIB")
+
+# A gateway only ever talks to a handful of distinct addresses, so intern
+# TTAddress instances instead of allocating two fresh ones per packet.
+_ADDR_CACHE: Dict[int, TTAddress] = {}
+_ADDR_CACHE_MAX = 1024
+
+
+def _addr(address: int) -> TTAddress:
+    cached = _ADDR_CACHE.get(address)
+    if cached is None:
+        if len(_ADDR_CACHE) >= _ADDR_CACHE_MAX:
+            _ADDR_CACHE.clear()
+        cached = _ADDR_CACHE[address] = TTAddress(address)
+    return cached
+
+
 def unmarshall(raw: bytes) -> TTPacket:
-    raw_stream = BytesIO(raw)
+    # Parse in place over a memoryview: no BytesIO wrapper and no copies
+    # from the intermediate read() calls.
+    buf = memoryview(raw)
     receiver: int
     sender: int
     packet_type: int
 
-    receiver, sender, packet_type = unpack("=IIB", raw_stream.read(9))
+    receiver, sender, packet_type = _HEADER.unpack_from(buf, 0)
 
-    receiver_address = TTAddress(receiver)
-    sender_address: TTAddress = TTAddress(sender)
+    receiver_address = _addr(receiver)
+    sender_address: TTAddress = _addr(sender)
 
-    parsed_packet: TTPacket = PACKET_TYPES[packet_type](
-        receiver_address, sender_address, raw_stream
-    )
-    raw_stream.close()
-    return parsed_packet
+    try:
+        parse = _DISPATCH[packet_type]
+    except IndexError:
+        parse = None
+    if parse is None:
+        raise KeyError(packet_type)
+
+    return parse(receiver_address, sender_address, buf, 9)
 
 
 SAMPLE_RAW: Dict[str, bytes] = {
@@ -765,22 +1011,22 @@ SAMPLE_PACKETS: Dict[str, TTPacket] = {
         sender_address=TTAddress(1375928658),
         packet_number=2,
         timestamp=14400,
-        AS7263={
-            610: 18.378816604614258,
-            680: 27.292129516601562,
-            730: 61.32038879394531,
-            760: 71.54167175292969,
-            810: 89.65918731689453,
-            860: 89.9144287109375,
-        },
-        AS7262={
-            450: 57.78248977661133,
-            500: 58.02138137817383,
-            550: 44.12318420410156,
-            570: 43.44166564941406,
-            600: 35.866127014160156,
-            650: 34.97055435180664,
-        },
+        AS7263=(
+            18.378816604614258,
+            27.292129516601562,
+            61.32038879394531,
+            71.54167175292969,
+            89.65918731689453,
+            89.9144287109375,
+        ),
+        AS7262=(
+            57.78248977661133,
+            58.02138137817383,
+            44.12318420410156,
+            43.44166564941406,
+            35.866127014160156,
+            34.97055435180664,
+        ),
         integration_time=50,
         gain=3,
     ),
@@ -1,17 +1,13 @@
 import logging
 import time
 
-from typing import Union, Dict, List
-from base64 import b64encode
-from collections import defaultdict
-from statistics import mean, stdev
+from typing import Optional, Tuple, Union, Dict, List
 
 from dataclasses import dataclass
 
 import paho.mqtt.client as mqtt
 import influxdb as influx
 from influxdb.resultset import ResultSet
-from sklearn.linear_model import LinearRegression
 
 from ttt.packets import (
     DataPacketRev31,
@@ -32,8 +28,11 @@ CONFIDENCE = 3
 ANALYSIS_INTERVAL = "2d"
 SLEEP_TIME_MIN = 300
 SLEEP_TIME_DEFAULT = 600
+HISTORY_CACHE_TTL = 300
 TIME_SLOT_LENGTH = 60
 CRITICAL_TEMPERATURE = 50
+# Packets carry the air temperature in tenths of a degree.
+CRITICAL_AIR_TEMPERATURE = CRITICAL_TEMPERATURE * 10
 
 
 @dataclass
@@ -45,66 +44,199 @@ class DataPolicy:
     aggregated_movement: Dict[str, float]
     aggregated_temperature: Dict[str, float]
 
-    def _evaluate_battery_3_2(self, packet: DataPacketRev32) -> int:
-        battery_voltage = compute_battery_voltage_rev_3_2(
-            adc_volt_bat=packet.adc_volt_bat, adc_bandgap=packet.adc_bandgap
-        )
-        return self._evaluate_battery(
-            sender_address=packet.sender_address.address,
-            battery_voltage=battery_voltage,
+    def __post_init__(self) -> None:
+        self.update_aggregated_movement(self.aggregated_movement)
+        self.update_aggregated_temperature(self.aggregated_temperature)
+
+        # Running regression sums per treetalker: (n, t0, sum_t, sum_t2,
+        # sum_v, sum_tv), with timestamps kept relative to t0 so the
+        # squared sums stay well-conditioned. Each packet folds one point
+        # in and the slope falls out in O(1); the voltage history is only
+        # read from influx once per treetalker, to seed the sums.
+        self._regression_state: Dict[
+            int, Tuple[int, int, float, float, float, float]
+        ] = {}
+
+        # The two-day aggregates barely move between packets, so they are
+        # cached per treetalker and only re-queried once the TTL runs out.
+        self._history_cache: Dict[
+            int,
+            Tuple[int, Optional[Dict[str, float]], Optional[Dict[str, float]]],
+        ] = {}
+
+    def update_aggregated_movement(self, data: Dict[str, float]) -> None:
+        """Store new aggregated movement data and precompute the anomaly
+        thresholds, so the per-packet check is plain comparisons instead of
+        six dict lookups and three multiplications."""
+        self.aggregated_movement = data
+        if data:
+            self.movement_thresholds: Optional[Tuple[float, ...]] = (
+                data["mean_x"],
+                data["stdev_x"] * CONFIDENCE,
+                data["mean_y"],
+                data["stdev_y"] * CONFIDENCE,
+                data["mean_z"],
+                data["stdev_z"] * CONFIDENCE,
+            )
+        else:
+            self.movement_thresholds = None
+
+    def update_aggregated_temperature(self, data: Dict[str, float]) -> None:
+        self.aggregated_temperature = data
+        if data:
+            self.temperature_thresholds: Optional[Tuple[float, float]] = (
+                data["stdev_delta_cold"] * CONFIDENCE,
+                data["stdev_delta_hot"] * CONFIDENCE,
+            )
+        else:
+            self.temperature_thresholds = None
+
+    def _fetch_history(
+        self, sender_address: int, now: int
+    ) -> Tuple[Optional[Dict[str, float]], Optional[Dict[str, float]]]:
+        """Return the gravity and stem temperature aggregates for one
+        treetalker, re-querying influx at most once per TTL. A miss costs
+        a single multi-statement round-trip; a hit costs a dict lookup."""
+        cached = self._history_cache.get(sender_address)
+        if cached is not None and now < cached[0]:
+            return cached[1], cached[2]
+
+        query = ";".join(
+            (
+                f'SELECT MEAN("x_mean") AS mean_x, STDDEV("x_mean") AS stdev_x, MEAN("y_mean") AS mean_y, STDDEV("y_mean") AS stdev_y, MEAN("z_mean") AS mean_z, STDDEV("z_mean") AS stdev_z FROM "gravity" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{sender_address}\')',
+                f'SELECT MEAN("delta_cold") AS mean_delta_cold, MEAN("delta_hot") AS mean_delta_hot FROM (SELECT ABS("ttt_heat_probe_cold" - "ttt_reference_probe_cold") AS delta_cold, ABS("ttt_heat_probe_hot" - "ttt_reference_probe_hot") AS delta_hot FROM "stem_temperature" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{sender_address}\'))',
+            )
         )
 
-    def _evaluate_battery_3_1(self, packet: DataPacketRev31) -> int:
-        battery_voltage = compute_battery_voltage_rev_3_1(voltage=packet.voltage)
-        return self._evaluate_battery(
-            sender_address=packet.sender_address.address,
-            battery_voltage=battery_voltage,
+        try:
+            # epoch="s" makes influx return integer second timestamps, so
+            # no per-row strptime/mktime parsing is needed.
+            gravity_data, stem_data = self.influx_client.query(query, epoch="s")
+        except influx.client.InfluxDBServerError as err:
+            # Errors are not cached; the next packet retries.
+            logging.error("Influxdb error: %s", err)
+            return None, None
+
+        gravity_stats = next(gravity_data.get_points("gravity"), None)
+        stem_stats = next(stem_data.get_points("stem_temperature"), None)
+
+        self._history_cache[sender_address] = (
+            now + HISTORY_CACHE_TTL,
+            gravity_stats,
+            stem_stats,
         )
 
-    def _evaluate_battery(self, sender_address: int, battery_voltage: float) -> int:
+        return gravity_stats, stem_stats
+
+    @staticmethod
+    def _fold_regression_points(points) -> Tuple[int, int, float, float, float, float]:
+        count = 0
+        origin = 0
+        sum_t = sum_t2 = sum_v = sum_tv = 0.0
+        for datapoint in points:
+            if count == 0:
+                origin = datapoint["time"]
+            offset = datapoint["time"] - origin
+            voltage = datapoint["ttt_voltage"]
+            count += 1
+            sum_t += offset
+            sum_t2 += offset * offset
+            sum_v += voltage
+            sum_tv += offset * voltage
+
+        return count, origin, sum_t, sum_t2, sum_v, sum_tv
+
+    def prime_regression_state(self) -> None:
+        """Seed the battery regression sums for every treetalker with one
+        grouped query, so nodes seen after startup do not each pay a
+        bootstrap round-trip on their first packet."""
         try:
             data: ResultSet = self.influx_client.query(
-                f'SELECT "ttt_voltage" FROM "power" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{sender_address}\')'
+                f'SELECT "ttt_voltage" FROM "power" WHERE "time" > now() - {ANALYSIS_INTERVAL} GROUP BY "treetalker"',
+                epoch="s",
             )
         except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
-            return SLEEP_TIME_DEFAULT
+            logging.error("Influxdb error: %s", err)
+            return
 
-        times = []
-        voltages = []
-        for datapoint in data.get_points("power"):
-            timestamp = int(
-                time.mktime(time.strptime(datapoint["time"], "%Y-%m-%dT%H:%M:%S.%fZ"))
-            )
-            times.append([timestamp])
-            voltages.append(datapoint["ttt_voltage"])
+        for (_, tags), points in data.items():
+            self._regression_state[
+                int(tags["treetalker"])
+            ] = self._fold_regression_points(points)
 
-        if not times or not voltages:
-            logging.debug(
-                f"No data to compute regression: [times: {len(times)}, voltages: {len(voltages)}]"
-            )
-            return SLEEP_TIME_DEFAULT
+        logging.info(
+            "Primed battery regression for %s treetalkers",
+            len(self._regression_state),
+        )
 
-        logging.debug(
-            f"Historical battery data from influx: [times: {len(times)}, voltages: {len(voltages)}]"
+    def _bootstrap_regression(
+        self, sender_address: int
+    ) -> Optional[Tuple[int, int, float, float, float, float]]:
+        """Seed the running regression sums from the recorded voltage
+        history of one treetalker."""
+        try:
+            data: ResultSet = self.influx_client.query(
+                f'SELECT "ttt_voltage" FROM "power" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{sender_address}\')',
+                epoch="s",
+            )
+        except influx.client.InfluxDBServerError as err:
+            logging.error("Influxdb error: %s", err)
+            return None
+
+        state = self._fold_regression_points(data.get_points("power"))
+        logging.debug("Seeded battery regression with %s points from influx", state[0])
+        return state
+
+    def _evaluate_battery(
+        self, sender_address: int, battery_voltage: float, now: int
+    ) -> int:
+        state = self._regression_state.get(sender_address)
+        if state is None:
+            state = self._bootstrap_regression(sender_address)
+            if state is None:
+                return SLEEP_TIME_DEFAULT
+
+        count, origin, sum_t, sum_t2, sum_v, sum_tv = state
+
+        if count == 0:
+            origin = now
+        offset = now - origin
+
+        count += 1
+        sum_t += offset
+        sum_t2 += offset * offset
+        sum_v += battery_voltage
+        sum_tv += offset * battery_voltage
+
+        self._regression_state[sender_address] = (
+            count,
+            origin,
+            sum_t,
+            sum_t2,
+            sum_v,
+            sum_tv,
         )
 
-        times.append([int(time.time())])
-        voltages.append(battery_voltage)
+        if count < 2:
+            logging.debug("No data to compute regression: [points: %s]", count)
+            return SLEEP_TIME_DEFAULT
 
-        reg: LinearRegression = LinearRegression().fit(times, voltages)
+        # Closed-form least squares over the running sums: folding the new
+        # point in and reading the slope off is O(1) per packet, instead
+        # of refitting over the full history every time.
+        denominator = count * sum_t2 - sum_t * sum_t
+        slope = (count * sum_tv - sum_t * sum_v) / denominator if denominator else 0.0
+        intercept = (sum_v - slope * sum_t) / count
         logging.debug(
-            f"Linear regression: [Coefficients: {reg.coef_}, intercept: {reg.intercept_}]"
+            "Linear regression: [Coefficients: [%s], intercept: %s]", slope, intercept
         )
 
         sleep_time = self.sleep_times.get(sender_address, SLEEP_TIME_DEFAULT)
-        logging.debug(f"Retrieved sleep time: {sleep_time}")
+        logging.debug("Retrieved sleep time: %s", sleep_time)
 
-        sleep_time = int(
-            sleep_time
-            + (RDE * (3700 - reg.predict([[int(time.time()) + (3600 * 48)]])[0]))
-        )
-        logging.debug(f"Computed sleep time: {sleep_time}")
+        predicted = slope * (offset + (3600 * 48)) + intercept
+        sleep_time = int(sleep_time + (RDE * (3700 - predicted)))
+        logging.debug("Computed sleep time: %s", sleep_time)
 
         sleep_time = max(sleep_time, SLEEP_TIME_MIN)
 
@@ -113,26 +245,36 @@ class DataPolicy:
         return sleep_time
 
     def _evaluate_position(
-        self, packet: DataPacketRev32, means: Dict[str, List[int]]
+        self, packet: DataPacketRev32, stats: Dict[str, float]
     ) -> bool:
-        for dimension, values in means.items():
-            if len(values) < 2:
-                logging.debug(f"Dimension {dimension} only has {len(values)} values")
+        # STDDEV is null until a dimension has at least two points.
+        for dimension in ("x", "y", "z"):
+            if stats[f"stdev_{dimension}"] is None:
+                logging.debug("Dimension %s has too few values", dimension)
                 return False
 
-        mean_x = mean(means["x"])
-        stdev_x = stdev(means["x"])
-        mean_y = mean(means["y"])
-        stdev_y = stdev(means["y"])
-        mean_z = mean(means["z"])
-        stdev_z = stdev(means["z"])
+        mean_x = stats["mean_x"]
+        stdev_x = stats["stdev_x"]
+        mean_y = stats["mean_y"]
+        stdev_y = stats["stdev_y"]
+        mean_z = stats["mean_z"]
+        stdev_z = stats["stdev_z"]
 
         x = packet.gravity_x_mean
         y = packet.gravity_y_mean
         z = packet.gravity_z_mean
 
         logging.debug(
-            f"Position data: [mean_x: {mean_x}, stdev_x: {stdev_x}, mean_y: {mean_y}, stdev_y: {stdev_y}, mean_z: {mean_z}, stdev_z: {stdev_z}, x: {x}, y: {y}, z: {z}]"
+            "Position data: [mean_x: %s, stdev_x: %s, mean_y: %s, stdev_y: %s, mean_z: %s, stdev_z: %s, x: %s, y: %s, z: %s]",
+            mean_x,
+            stdev_x,
+            mean_y,
+            stdev_y,
+            mean_z,
+            stdev_z,
+            x,
+            y,
+            z,
         )
 
         anomaly = (
@@ -141,82 +283,84 @@ class DataPolicy:
             or abs(z - mean_z) > (stdev_z * CONFIDENCE)
         )
 
-        logging.debug(f"Detected position anomaly: {anomaly}")
+        logging.debug("Detected position anomaly: %s", anomaly)
 
         return anomaly
 
     def _evaluate_movement(self, packet: DataPacketRev32) -> bool:
-        if not self.aggregated_movement:
+        if self.movement_thresholds is None:
             logging.info("Haven't received any aggregated movement data yet.")
             return False
 
+        mean_x, limit_x, mean_y, limit_y, mean_z, limit_z = self.movement_thresholds
+
         x = packet.gravity_x_derivation
         y = packet.gravity_y_derivation
         z = packet.gravity_z_derivation
 
         logging.debug(
-            f"Movement data: [x: {x}, y: {y}, z: {z}, aggregate: {self.aggregated_movement}]"
+            "Movement data: [x: %s, y: %s, z: %s, aggregate: %s]",
+            x,
+            y,
+            z,
+            self.aggregated_movement,
         )
 
         anomaly = (
-            abs(x - self.aggregated_movement["mean_x"])
-            > (self.aggregated_movement["stdev_x"] * CONFIDENCE)
-            or abs(y - self.aggregated_movement["mean_y"])
-            > (self.aggregated_movement["stdev_y"] * CONFIDENCE)
-            or abs(z - self.aggregated_movement["mean_z"])
-            > (self.aggregated_movement["stdev_z"] * CONFIDENCE)
+            abs(x - mean_x) > limit_x
+            or abs(y - mean_y) > limit_y
+            or abs(z - mean_z) > limit_z
         )
 
-        logging.debug(f"Detected movement anomaly: {anomaly}")
+        logging.debug("Detected movement anomaly: %s", anomaly)
 
         return anomaly
 
     def _evaluate_gravity(
-        self, packet: Union[DataPacketRev31, DataPacketRev32]
+        self,
+        packet: Union[DataPacketRev31, DataPacketRev32],
+        stats: Optional[Dict[str, float]],
     ) -> bool:
-        means: Dict[str, List[int]] = defaultdict(list)
-
-        try:
-            data: ResultSet = self.influx_client.query(
-                f'SELECT "x_mean", "y_mean", "z_mean" FROM "gravity" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{packet.sender_address.address}\')'
-            )
-        except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
-            return False
-
-        for datapoint in data.get_points("gravity"):
-            means["x"].append(datapoint["x_mean"])
-            means["y"].append(datapoint["y_mean"])
-            means["z"].append(datapoint["z_mean"])
-
-        if not means:
+        # The per-axis statistics are aggregated server-side: one row
+        # comes back instead of every raw point of the analysis window.
+        if stats is None:
             logging.debug("No historical gravity data present.")
             return False
 
         anomaly = self._evaluate_position(
-            packet=packet, means=means
+            packet=packet, stats=stats
         ) or self._evaluate_movement(packet=packet)
 
-        logging.debug(f"Detected gravity anomaly: {anomaly}")
+        logging.debug("Detected gravity anomaly: %s", anomaly)
 
         return anomaly
 
     def _evaluate_air_temperature(
         self, packet: Union[DataPacketRev31, DataPacketRev32]
     ) -> bool:
-        anomaly = packet.air_temperature >= CRITICAL_TEMPERATURE * 10
-        logging.debug(f"Found air temperature anomaly: {anomaly}")
+        anomaly = packet.air_temperature >= CRITICAL_AIR_TEMPERATURE
+        logging.debug("Found air temperature anomaly: %s", anomaly)
         return anomaly
 
     def _evaluate_stem_temperature(
-        self, packet: Union[DataPacketRev31, DataPacketRev32]
+        self,
+        packet: Union[DataPacketRev31, DataPacketRev32],
+        stats: Optional[Dict[str, float]],
     ) -> bool:
         logging.info("Evaluating stem temperature")
-        if not self.aggregated_temperature:
+        if stats is None:
+            logging.debug("No historical temperature data present.")
+            return False
+
+        if self.temperature_thresholds is None:
             logging.info("Haven't received any aggregated temperature data yet.")
             return False
         else:
-            logging.debug(f"Aggregated temperature data: {self.aggregated_temperature}")
+            logging.debug(
+                "Aggregated temperature data: %s", self.aggregated_temperature
+            )
+
+        limit_delta_cold, limit_delta_hot = self.temperature_thresholds
 
         temperature_reference_cold = compute_temperature(
             packet.temperature_reference_cold
@@ -229,94 +373,71 @@ class DataPolicy:
         delta_cold = abs(temperature_heat_cold - temperature_reference_cold)
         delta_hot = abs(temperature_heat_hot - temperature_reference_hot)
 
-        try:
-            data: ResultSet = self.influx_client.query(
-                f'SELECT "ttt_reference_probe_cold", "ttt_reference_probe_hot", "ttt_heat_probe_cold", "ttt_heat_probe_hot" FROM "stem_temperature" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{packet.sender_address.address}\')'
-            )
-        except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
-            return False
-
-        reference_probe_cold: List[float] = []
-        reference_probe_hot: List[float] = []
-        heat_probe_cold: List[float] = []
-        heat_probe_hot: List[float] = []
-
-        for datapoint in data.get_points("stem_temperature"):
-            reference_probe_cold.append(datapoint["ttt_reference_probe_cold"])
-            reference_probe_hot.append(datapoint["ttt_reference_probe_hot"])
-            heat_probe_cold.append(datapoint["ttt_heat_probe_cold"])
-            heat_probe_hot.append(datapoint["ttt_heat_probe_hot"])
+        # The probe deltas are averaged server-side: ABS() on the field
+        # difference inside a subquery, MEAN() over it outside, so one row
+        # comes back instead of the raw window.
+        mean_delta_cold = stats["mean_delta_cold"]
+        mean_delta_hot = stats["mean_delta_hot"]
 
-        if (
-            not reference_probe_cold
-            or not reference_probe_hot
-            or not heat_probe_cold
-            or not heat_probe_hot
-        ):
-            logging.debug(
-                f"No historical temperature data present: [reference_probe_cold: {len(reference_probe_cold)}, reference_probe_hot: {len(reference_probe_hot)}, heat_probe_cold: {len(heat_probe_cold)}, heat_probe_hot: {len(heat_probe_hot)}]"
-            )
-            return False
-
-        logging.debug(
-            f"Historical temperature data: [reference_probe_cold: {len(reference_probe_cold)}, reference_probe_hot: {len(reference_probe_hot)}, heat_probe_cold: {len(heat_probe_cold)}, heat_probe_hot: {len(heat_probe_hot)}]"
-        )
-
-        deltas_cold: List[float] = [
-            abs(heat - reference)
-            for heat, reference in zip(heat_probe_cold, reference_probe_cold)
-        ]
-        mean_delta_cold = mean(deltas_cold)
-
-        deltas_hot: List[float] = [
-            abs(heat - reference)
-            for heat, reference in zip(heat_probe_hot, reference_probe_hot)
-        ]
-        mean_delta_hot = mean(deltas_hot)
-
-        anomaly = abs(delta_cold - mean_delta_cold) > (
-            self.aggregated_temperature["stdev_delta_cold"] * CONFIDENCE
-        ) or abs(delta_hot - mean_delta_hot) > (
-            self.aggregated_temperature["stdev_delta_hot"] * CONFIDENCE
+        anomaly = (
+            abs(delta_cold - mean_delta_cold) > limit_delta_cold
+            or abs(delta_hot - mean_delta_hot) > limit_delta_hot
         )
 
-        logging.debug(f"Detected temperature anomaly: {anomaly}")
+        logging.debug("Detected temperature anomaly: %s", anomaly)
 
         return anomaly
 
     def evaluate(self, packet: Union[DataPacketRev31, DataPacketRev32]) -> TTCommand1:
+        # One wall-clock read per evaluation: the regression and the
+        # command timestamp see the same instant.
+        now = int(time.time())
+
+        gravity_stats, stem_stats = self._fetch_history(
+            packet.sender_address.address, now
+        )
+
         logging.debug("Computing sleep time")
         if isinstance(packet, DataPacketRev31):
-            sleep_interval: int = self._evaluate_battery_3_1(packet=packet)
+            battery_voltage = compute_battery_voltage_rev_3_1(voltage=packet.voltage)
         else:
-            sleep_interval: int = self._evaluate_battery_3_2(packet=packet)
+            battery_voltage = compute_battery_voltage_rev_3_2(
+                adc_volt_bat=packet.adc_volt_bat, adc_bandgap=packet.adc_bandgap
+            )
+
+        sleep_interval = self._evaluate_battery(
+            sender_address=packet.sender_address.address,
+            battery_voltage=battery_voltage,
+            now=now,
+        )
 
-        logging.debug(f"Checking gravity data")
-        gravity_anomaly = self._evaluate_gravity(packet=packet)
+        logging.debug("Checking gravity data")
+        gravity_anomaly = self._evaluate_gravity(packet=packet, stats=gravity_stats)
         if gravity_anomaly:
             logging.info("Detected gravity anomaly")
             self.mqtt_client.publish(
                 f"anomaly/gravity/{self.local_address.address}",
-                b64encode(packet.marshall()),
+                packet.marshall(),
             )
 
-        logging.debug(f"Checking stem temperature")
-        stem_temperature_anomaly = self._evaluate_stem_temperature(packet=packet)
+        logging.debug("Checking stem temperature")
+        stem_temperature_anomaly = self._evaluate_stem_temperature(
+            packet=packet, stats=stem_stats
+        )
         if stem_temperature_anomaly:
             logging.info("Detected stem temperature anomaly")
             self.mqtt_client.publish(
                 f"anomaly/stem_temperature/{self.local_address.address}",
-                b64encode(packet.marshall()),
+                packet.marshall(),
             )
 
-        logging.debug(f"Checking air temperature")
+        logging.debug("Checking air temperature")
         air_temperature_anomaly = self._evaluate_air_temperature(packet=packet)
         if air_temperature_anomaly:
             logging.info("Detected air temperature anomaly")
             self.mqtt_client.publish(
                 f"anomaly/air_temperature/{self.local_address.address}",
-                b64encode(packet.marshall()),
+                packet.marshall(),
             )
 
         if gravity_anomaly or stem_temperature_anomaly or air_temperature_anomaly:
@@ -328,7 +449,7 @@ class DataPolicy:
             receiver_address=packet.sender_address,
             sender_address=self.local_address,
             command=32,
-            time=int(time.time()),
+            time=now,
             sleep_interval=sleep_interval,
             unknown=0,
             time_slot_length=TIME_SLOT_LENGTH,
@@ -342,6 +463,11 @@ class LightPolicy:
     local_address: TTAddress
     influx_client: influx.InfluxDBClient
 
+    # Channel weights, shared by the packet-side scaling and the weights
+    # baked into the brightness subqueries below.
+    SCALAR_RED = (0.4, 0.5, 1, 2, 3, 5)
+    SCALAR_BLUE = (1, 1, 1, 1, 1, 1)
+
     def _calculate_scaled_brightness(self, f: List[float], scal: List[float]) -> float:
         retval: float = 0
         for val, scalar in zip(f, scal):
@@ -353,52 +479,48 @@ class LightPolicy:
         # -> Airborne Optical and Thermal Remote Sensing for Wildfire Detection and Monitoring by Robert S. Allison et. al. 2016
         # Die wirklich wichtigen Frequenzen (z.B. 3µm für Hitze und 1.2nm für das Spektralband von Kaliumrauch) sind leider nicht erfasst
         # Darum Skalar bei den Infrarot - Rotbereich 860nm bis 610nm zugunsten des Infrarotbereiches
-        scalar_red = [0.4, 0.5, 1, 2, 3, 5]
-        scalar_blue = [1, 1, 1, 1, 1, 1]
-        cur_redvalue = self._calculate_scaled_brightness(
-            list(packet.AS7263.values()), scalar_red
-        )
+        cur_redvalue = self._calculate_scaled_brightness(packet.AS7263, self.SCALAR_RED)
         cur_bluevalue = self._calculate_scaled_brightness(
-            list(packet.AS7262.values()), scalar_blue
+            packet.AS7262, self.SCALAR_BLUE
         )
 
-        redvalues: List[float] = []
-        bluevalues: List[float] = []
-        data: ResultSet = self.influx_client.query(
-            f'SELECT "610", "680", "730", "760", "810", "860" FROM "AS7263" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{packet.sender_address.address}\')'
-        )
-        for datapoint in data.get_points("AS7263"):
-            redvalues.append(
-                self._calculate_scaled_brightness(list(datapoint.values()), scalar_red)
+        # The scaled brightness of every historical row is computed inside
+        # a subquery and only its MEAN/STDDEV come back, one row per
+        # sensor, instead of shipping the raw spectra and scaling them in
+        # Python. Both statements travel in one request.
+        where = f'"time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{packet.sender_address.address}\')'
+        query = ";".join(
+            (
+                f'SELECT MEAN("brightness") AS mean_brightness, STDDEV("brightness") AS stdev_brightness FROM (SELECT ("610" * 0.4 + "680" * 0.5 + "730" + "760" * 2 + "810" * 3 + "860" * 5) / 6 AS brightness FROM "AS7263" WHERE {where})',
+                f'SELECT MEAN("brightness") AS mean_brightness, STDDEV("brightness") AS stdev_brightness FROM (SELECT ("450" + "500" + "550" + "570" + "600" + "650") / 6 AS brightness FROM "AS7262" WHERE {where})',
             )
-
-        # Optimierungsbedarf: beim Versuch ein Query über zwei Tables durchzuführen gab es bei mir
-        # zwei Resultsets zurück mit gemischten Abfragefeldern. Hierdurch konnte ich nicht mehr einfach in List casten.
-        # Darum lieber zwei Queries sofern es nicht anders schöner machbar ist.
-
-        data2: ResultSet = self.influx_client.query(
-            f'SELECT "450", "500", "550", "570", "600", "650" FROM "AS7262" WHERE "time" > now() - {ANALYSIS_INTERVAL} AND ("treetalker" = \'{packet.sender_address.address}\')'
         )
-        for datapoint in data2.get_points("AS7262"):
-            bluevalues.append(
-                self._calculate_scaled_brightness(list(datapoint.values()), scalar_blue)
-            )
 
-        if not bluevalues or not redvalues:
+        red_data, blue_data = self.influx_client.query(query, epoch="s")
+        red_stats = next(red_data.get_points("AS7263"), None)
+        blue_stats = next(blue_data.get_points("AS7262"), None)
+
+        if red_stats is None or blue_stats is None:
             logging.debug(
-                f"No historical light data present: [bluevalues: {bluevalues}, redvalues: {redvalues}]"
+                "No historical light data present: [red: %s, blue: %s]",
+                red_stats,
+                blue_stats,
             )
             return False
 
-        mean_redvalues = mean(redvalues)
-        mean_bluevalues = mean(bluevalues)
-
-        # max_dev_redvalues = max(abs(el - mean_redvalues) for el in redvalues)
-        # max_dev_bluevalues = max(abs(el - mean_bluevalues) for el in bluevalues)
+        # STDDEV is null until a sensor has at least two points.
+        if (
+            red_stats["stdev_brightness"] is None
+            or blue_stats["stdev_brightness"] is None
+        ):
+            logging.debug("Too few historical light values")
+            return False
 
-        return abs(cur_bluevalue - mean_bluevalues) > (
-            stdev(bluevalues) * CONFIDENCE
-        ) or abs(cur_redvalue - mean_redvalues) > (stdev(redvalues) * CONFIDENCE)
+        return abs(cur_bluevalue - blue_stats["mean_brightness"]) > (
+            blue_stats["stdev_brightness"] * CONFIDENCE
+        ) or abs(cur_redvalue - red_stats["mean_brightness"]) > (
+            red_stats["stdev_brightness"] * CONFIDENCE
+        )
 
     def evaluate(self, packet: LightSensorPacket) -> TTCommand2:
         return TTCommand2(
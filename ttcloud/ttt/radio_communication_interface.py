@@ -8,7 +8,6 @@ import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
 
 from typing import Any
-from base64 import b64encode, b64decode
 
 from ttt.SX127x.LoRa import LoRa
 from ttt.SX127x.board_config import BOARD
@@ -32,18 +31,18 @@ class LoRaParser(LoRa):
         LoRa.__init__(self=self, verbose=verbose)
 
         self.address = address
-        logging.debug(f"Own address: {self.address}")
+        logging.debug("Own address: %s", self.address)
 
         self.mqtt_client = mqtt.Client("rci")
         self.mqtt_client.connect(broker_address)
         self.mqtt_client.on_message = self.on_message
 
         self.respond = respond
-        logging.debug(f"Will respond to packages: {self.respond}")
+        logging.debug("Will respond to packages: %s", self.respond)
         self.sniffer = sniffer
-        logging.debug(f"Running in sniffer-mode: {self.sniffer}")
+        logging.debug("Running in sniffer-mode: %s", self.sniffer)
         self.gateway = gateway
-        logging.debug(f"Gateway type: {self.gateway}")
+        logging.debug("Gateway type: %s", self.gateway)
 
     def __enter__(self) -> LoRaParser:
 
@@ -86,15 +85,17 @@ class LoRaParser(LoRa):
     def on_rx_done(self) -> None:
         """Callback called when a packet is received."""
         self.clear_irq_flags(RxDone=1)
-        payload = self.read_payload(nocheck=True)[4:]
-        logging.debug(f"RAW Receive: {bytes(payload).hex()}")
-        packet: TTPacket = unmarshall(bytes(payload))
-        logging.debug(f"Parsed Receive: {packet}")
+        raw = bytes(self.read_payload(nocheck=True)[4:])
+        logging.debug("RAW Receive: %s", raw.hex())
+        packet: TTPacket = unmarshall(raw)
+        logging.debug("Parsed Receive: %s", packet)
 
+        # Forward the frame as received instead of re-marshalling the
+        # parsed packet; the bytes are identical and the copy is free.
         if self.sniffer:
             self.mqtt_client.publish(
                 topic=f"sniffer/{self.gateway}",
-                payload=b64encode(packet.marshall()),
+                payload=raw,
             )
             return
 
@@ -104,7 +105,7 @@ class LoRaParser(LoRa):
 
         self.mqtt_client.publish(
             topic=f"receive/{self.address.address}",
-            payload=b64encode(packet.marshall()),
+            payload=raw,
         )
 
     def on_tx_done(self) -> None:
@@ -122,7 +123,7 @@ class LoRaParser(LoRa):
             time.sleep(0.5)
 
     def send_packet(self, packet: TTPacket) -> None:
-        logging.debug(f"Sending packet: {packet}")
+        logging.debug("Sending packet: %s", packet)
         self.write_payload([255, 255, 0, 0] + list(packet.marshall()))
         self.set_dio_mapping([1, 0, 0, 0, 0, 0])  # Aktiviere DIO0 für TXDone trigger
         self.set_mode(MODE.TX)
@@ -130,8 +131,8 @@ class LoRaParser(LoRa):
     def on_message(
         self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
     ) -> None:
-        logging.debug(f"Received MQTT Message on topic {message.topic}")
-        packet = unmarshall(b64decode(message.payload))
+        logging.debug("Received MQTT Message on topic %s", message.topic)
+        packet = unmarshall(message.payload)
         if self.respond:
             self.send_packet(packet)
 
@@ -5,14 +5,12 @@ import argparse
 import logging
 import time
 
-from typing import Any, Dict, Tuple
-from base64 import b64decode
+from typing import Any, Callable, Dict, List, Tuple
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
 import influxdb as influx
 
-from ttt.address import TTAddress
 from ttt.packets import (
     unmarshall,
     TTPacket,
@@ -22,6 +20,10 @@ from ttt.packets import (
     TTCommand1,
     TTCommand2,
 )
+from ttt.util import tune_influx_session
+
+INFLUX_FLUSH_POINTS = 100
+INFLUX_FLUSH_INTERVAL = 1.0
 
 
 class ResponseAnalyser:
@@ -35,9 +37,29 @@ class ResponseAnalyser:
         self.mqtt_client.on_message = self.on_message
         self.mqtt_client.subscribe("sniffer/#")
 
-        self.influx_client = influx.InfluxDBClient(host=influx_address, port=8086)
-
-        self.waiting_for_reply: Dict[Tuple[TTAddress, str], float] = {}
+        self.influx_client = influx.InfluxDBClient(
+            host=influx_address, port=8086, gzip=True
+        )
+        tune_influx_session(self.influx_client)
+
+        # Keyed by the raw int address: int hashing is C-level, while
+        # TTAddress keys would pay a Python __hash__ per lookup.
+        self.waiting_for_reply: Dict[Tuple[int, str], float] = {}
+
+        # One dict lookup on the concrete type replaces the isinstance
+        # chain that walked the MRO for every sniffed packet.
+        self.packet_handlers: Dict[type, Tuple[Callable[..., None], str]] = {
+            TTCommand1: (self._response_time, "data"),
+            TTCommand2: (self._response_time, "light"),
+            DataPacketRev31: (self._set_waiting, "data"),
+            DataPacketRev32: (self._set_waiting, "data"),
+            LightSensorPacket: (self._set_waiting, "light"),
+        }
+
+        # Buffered as line-protocol strings and flushed in batches, so a
+        # measurement costs a list append instead of an HTTP request.
+        self.influx_buffer: List[str] = []
+        self.last_flush = time.monotonic()
 
     def __enter__(self) -> ResponseAnalyser:
         self.mqtt_client.loop_start()
@@ -46,6 +68,7 @@ class ResponseAnalyser:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._flush()
         self.mqtt_client.loop_stop()
         self.mqtt_client.disconnect(
             reasoncode=mqtt.ReasonCodes(
@@ -57,7 +80,7 @@ class ResponseAnalyser:
     def on_message(
         self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
     ) -> None:
-        logging.debug(f"Received message on {message.topic}")
+        logging.debug("Received message on %s", message.topic)
 
         if "ttcloud" in message.topic:
             logging.debug("Received command from ttcloud")
@@ -66,61 +89,77 @@ class ResponseAnalyser:
             logging.debug("Received command from ttt")
             self._handle_receive(message, responder="ttt")
         else:
-            logging.error(f"Received message from unknown MQTT-topic: {message.topic}")
+            logging.error("Received message from unknown MQTT-topic: %s", message.topic)
 
     def _response_time(
         self, packet: TTPacket, responder: str, now: float, packet_type: str
     ) -> None:
         try:
-            request_time = self.waiting_for_reply[packet.receiver_address, packet_type]
+            request_time = self.waiting_for_reply[
+                packet.receiver_address.address, packet_type
+            ]
             response_time = now - request_time
         except KeyError:
             logging.error(
-                f"Didn't receive any data packet from {packet.receiver_address}"
+                "Didn't receive any data packet from %s", packet.receiver_address
             )
             return
 
         logging.info(
-            f"Answer to {packet.receiver_address} from {responder}: {response_time}"
+            "Answer to %s from %s: %s",
+            packet.receiver_address,
+            responder,
+            response_time,
+        )
+
+        point = (
+            f"response_time,treetalker={packet.receiver_address.address},"
+            f"responder={responder},packet_type={packet_type} "
+            f"response_time={response_time}"
         )
 
-        influx_json = [
-            {
-                "measurement": "response_time",
-                "tags": {
-                    "treetalker": packet.receiver_address.address,
-                    "responder": responder,
-                    "packet_type": packet_type,
-                },
-                "fields": {"response_time": response_time},
-            },
-        ]
+        logging.debug("Buffering data for influx: %s", point)
+
+        self.influx_buffer.append(point)
+        if (
+            len(self.influx_buffer) >= INFLUX_FLUSH_POINTS
+            or time.monotonic() - self.last_flush >= INFLUX_FLUSH_INTERVAL
+        ):
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.influx_buffer:
+            return
+
+        points = self.influx_buffer
+        self.influx_buffer = []
+        self.last_flush = time.monotonic()
 
-        logging.debug(f"Sending data to influx: {influx_json}")
+        logging.debug("Flushing %s points to influx", len(points))
 
         try:
-            self.influx_client.write_points(influx_json)
+            self.influx_client.write_points(points, protocol="line", batch_size=5000)
         except influx.client.InfluxDBServerError as err:
-            logging.error(f"Influxdb error: {err}")
+            logging.error("Influxdb error: %s", err)
+
+    def _set_waiting(
+        self, packet: TTPacket, responder: str, now: float, packet_type: str
+    ) -> None:
+        self.waiting_for_reply[packet.sender_address.address, packet_type] = now
 
     def _handle_receive(self, message: mqtt.MQTTMessage, responder: str) -> None:
-        packet: TTPacket = unmarshall(b64decode(message.payload))
+        packet: TTPacket = unmarshall(message.payload)
         now = time.time()
 
-        if isinstance(packet, TTCommand1):
-            self._response_time(
-                packet=packet, responder=responder, now=now, packet_type="data"
+        entry = self.packet_handlers.get(type(packet))
+        if entry is None:
+            logging.debug(
+                "Not interested in packet type: %s", packet.__class__.__name__
             )
-        elif isinstance(packet, TTCommand2):
-            self._response_time(
-                packet=packet, responder=responder, now=now, packet_type="light"
-            )
-        elif isinstance(packet, DataPacketRev31) or isinstance(packet, DataPacketRev32):
-            self.waiting_for_reply[packet.sender_address, "data"] = now
-        elif isinstance(packet, LightSensorPacket):
-            self.waiting_for_reply[packet.sender_address, "light"] = now
-        else:
-            logging.debug(f"Not interested in packet type: {packet.__class__.__name__}")
+            return
+
+        handler, packet_type = entry
+        handler(packet=packet, responder=responder, now=now, packet_type=packet_type)
 
 
 if __name__ == "__main__":
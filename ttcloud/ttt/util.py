@@ -1,30 +1,68 @@
+from functools import lru_cache
+from typing import Any
 from uuid import getnode as get_mac
 
+import influxdb as influx
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from ttt.address import TTAddress
 
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    import json
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
 
 mV_BANDGAP = 1100
 
 
+# ADC readings change slowly between packets, so the same raw values
+# repeat constantly; memoising turns the polynomial into a dict hit.
+@lru_cache(maxsize=4096)
 def compute_temperature(measurement: int) -> float:
+    # Horner form of the calibration cubic: three fused multiply-adds
+    # instead of separate ** 2 / ** 3 powers.
     return round(
-        (
-            127.6
-            - (0.006045 * measurement)
-            + (1.26e-07 * (measurement ** 2))
-            - (1.15e-12 * (measurement ** 3))
-        ),
+        127.6
+        + measurement * (-0.006045 + measurement * (1.26e-07 - 1.15e-12 * measurement)),
         2,
     )
 
 
+def compute_temperatures(measurements: np.ndarray) -> np.ndarray:
+    """Vectorised compute_temperature over an array of raw ADC readings."""
+    m = np.asarray(measurements, dtype=np.float64)
+    return np.round(127.6 + m * (-0.006045 + m * (1.26e-07 - 1.15e-12 * m)), 2)
+
+
 def compute_battery_voltage_rev_3_2(adc_volt_bat: int, adc_bandgap: int) -> float:
     return 2 * mV_BANDGAP * (float(adc_volt_bat) / float(adc_bandgap))
 
 
+@lru_cache(maxsize=4096)
 def compute_battery_voltage_rev_3_1(voltage: int) -> float:
     return 650 + (131072 * (1100 / voltage))
 
 
 def generate_tt_address() -> TTAddress:
     return TTAddress(address=(get_mac() % 10000000000))
+
+
+def tune_influx_session(client: influx.InfluxDBClient) -> None:
+    """Enlarge the HTTP connection pool of the client so frequent small
+    reads/writes reuse kept-alive TCP connections instead of reconnecting."""
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.1),
+    )
+    client._session.mount("http://", adapter)
+    client._session.mount("https://", adapter)
+    client._session.headers["Connection"] = "keep-alive"